@@ -1,13 +1,15 @@
-import argparse, os
+import argparse, os, logging
 from .constants import DEFAULT_TRANSLATE_DIR, DEFAULT_DPI, DEFAULT_ERASE, DEFAULT_LANG, DEFAULT_OPTIMIZE, FONT_EN_LOGICAL, FONT_EN_PATH, FONT_HI_LOGICAL, FONT_HI_PATH
 from .pipeline import run_mode
-from .ocr import ocr_fix_pdf
-from .overlay import build_overlay_items_from_doc, overlay_load_items
+from .ocr import ocr_fix_pdf, needs_ocr
+from .overlay import OverlayConfig, build_overlay_items_from_doc, overlay_load_items
 from .utils import build_base, resolve_font
 from .textlayer import extract_original_page_objects
 
 # ------------------ CLI ------------------
 def main():
+    # the package logs through `logging`; show its progress lines like plain prints
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     ap = argparse.ArgumentParser(
         description="Unified PDF translator (span/line/block/hybrid/overlay/all) with OCR + style preservation."
     )
@@ -42,6 +44,11 @@ def main():
     # OCR control
     ap.add_argument("--skip-ocr", action="store_true",
                     help="Use original PDF without ocrmypdf pass")
+    ap.add_argument("--skip-ocr-if-text", action="store_true",
+                    help="Skip ocrmypdf when the first pages already have a text layer")
+
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Processes used to copy and draw pages (default: up to 4; 1 disables)")
 
     # ---------- OVERLAY-SPECIFIC KNOBS ----------
     ap.add_argument("--overlay-json",
@@ -77,12 +84,14 @@ def main():
     orig_index = extract_original_page_objects(args.input)
 
     # ---- OCR-fix (optional) ----
-    src_fixed = args.input if args.skip_ocr else ocr_fix_pdf(
-        args.input, lang=args.lang, dpi=args.dpi, optimize=args.optimize
-    )
+    # OCR replaces the existing (often broken Devanagari) text layer; opt out for born-digital input
+    run_ocr = not args.skip_ocr and not (args.skip_ocr_if_text and not needs_ocr(args.input))
+    src_fixed = ocr_fix_pdf(
+        args.input, lang=args.lang, dpi=args.dpi, optimize=args.optimize, num_workers=args.workers
+    ) if run_ocr else args.input
 
     # ---- build base docs (copies background) ----
-    src, out = build_base(src_fixed)
+    src, out = build_base(src_fixed, num_workers=args.workers)
 
     # ---- resolve fonts ----
     en_name, en_file = resolve_font(args.font_en_name, args.font_en_path)
@@ -118,11 +127,17 @@ def main():
         output_pdf=args.output,
         # overlay knobs
         overlay_items=overlay_items,
-        overlay_render=args.overlay_render,
-        overlay_align=args.overlay_align,
-        overlay_line_spacing=args.overlay_line_spacing,
-        overlay_margin_px=args.overlay_margin_px,
-        overlay_target_dpi=args.overlay_target_dpi,
-        overlay_scale_x=args.overlay_scale_x, overlay_scale_y=args.overlay_scale_y,
-        overlay_off_x=args.overlay_off_x, overlay_off_y=args.overlay_off_y,
-    )
\ No newline at end of file
+        overlay=OverlayConfig(
+            render=args.overlay_render,
+            align=args.overlay_align,
+            line_spacing=args.overlay_line_spacing,
+            margin_px=args.overlay_margin_px,
+            target_dpi=args.overlay_target_dpi,
+            scale_x=args.overlay_scale_x, scale_y=args.overlay_scale_y,
+            off_x=args.overlay_off_x, off_y=args.overlay_off_y,
+        ),
+        num_workers=args.workers,
+    )
+
+if __name__ == "__main__":
+    main()
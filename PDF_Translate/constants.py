@@ -21,4 +21,8 @@ FONT_HI_PATH_2    = str(Path(__file__).resolve().parent.parent / r"assets/fonts/
 
 _TR = Translator(timeout=TR_TIMEOUT, service_urls=["translate.googleapis.com"])
 _DEV = re.compile(r"[\u0900-\u097F]")   # Devanagari
-_LAT = re.compile(r"[A-Za-z]")
\ No newline at end of file
+_LAT = re.compile(r"[A-Za-z]")
+
+def _has_dev(s: str) -> bool:
+    """True if `s` contains any Devanagari character."""
+    return _DEV.search(s) is not None
@@ -40,6 +40,10 @@ class FontMatcher:
             }
         }
         
+        # (script, flags, original_font_name) -> (font_name, font_path); the key space is tiny
+        # but match_font runs once per drawn span/line/block.
+        self._cache: dict = {}
+
         # Try to find better matches in the same dir if possible
         self._auto_discover_variants("en", en_regular_path)
         self._auto_discover_variants("hi", hi_regular_path)
@@ -65,17 +69,29 @@ class FontMatcher:
             "bold_italic": ["-BoldItalic", "BoldItalic"],
         }
         
+        # One directory listing instead of an exists() syscall per candidate
+        try:
+            with os.scandir(dirname or ".") as it:
+                names = {e.name for e in it if e.is_file()}
+        except OSError:
+            return
+
         for key, suffixes in candidates.items():
             for suf in suffixes:
-                p = os.path.join(dirname, f"{prefix}{suf}{ext}")
-                if os.path.exists(p):
-                    self.registry[lang][key] = p
+                fname = f"{prefix}{suf}{ext}"
+                if fname in names:
+                    self.registry[lang][key] = os.path.join(dirname, fname)
                     break
 
     def match_font(self, script: str, original_flags: int, original_font_name: str = "") -> Tuple[str, str]:
         """
         Returns (font_name, font_file_path) based on script and style flags.
         """
+        key = (script, original_flags, original_font_name)
+        hit = self._cache.get(key)
+        if hit is not None:
+            return hit
+
         # Determine strict script
         # Determine strict script
         if script == "hi": lang = "hi"
@@ -104,4 +120,5 @@ class FontMatcher:
         # If we used a custom path, derive a name
         font_name = os.path.splitext(os.path.basename(font_path))[0]
         
+        self._cache[key] = (font_name, font_path)
         return font_name, font_path
@@ -1,4 +1,10 @@
-import re, fitz
+import re, json, fitz
+from pathlib import Path
+
+try:
+    import orjson  # optional: C serializer, several times faster on multi-MB item lists
+except ImportError:
+    orjson = None
 
 # ----------------------------
 # Helpers (for annotations)
@@ -163,4 +169,24 @@ def build_annotation_items_from_pdf(
                     items.append({"page": page_ix, "bbox": [x0, y0, x1, y1]})
 
     doc.close()
-    return items
\ No newline at end of file
+    return items
+
+def annotate_pdf_file(pdf_path: str, mode: str, regex_pattern: str, min_w: float, min_h: float,
+                      merge_lines: bool, margin: float, color, stroke_width: float,
+                      fill_opacity: float, use_annot: bool, fill: bool) -> str:
+    """
+    build_annotation_items_from_pdf + add_boxes_to_pdf for one PDF: writes <stem>.annotation_items.json
+    and <stem>.annot.pdf next to it and returns the annotated PDF's path (a process-pool entry point).
+    """
+    p = Path(pdf_path)
+    items = build_annotation_items_from_pdf(pdf_path=str(p), mode=mode, regex_pattern=regex_pattern,
+                                            min_w=min_w, min_h=min_h, merge_lines=merge_lines, margin=margin)
+    # Save the JSON (optional, for debugging/user download); one write of the whole document
+    json_path = p.with_name(p.stem + ".annotation_items.json")
+    if orjson is not None:
+        json_path.write_bytes(orjson.dumps(items, option=orjson.OPT_INDENT_2))
+    else:
+        json_path.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
+    return add_boxes_to_pdf(input_pdf=str(p), items=items, output_pdf=str(p.with_name(p.stem + ".annot.pdf")),
+                            page_is_one_based=False, color=color, stroke_width=stroke_width,
+                            fill_opacity=fill_opacity, use_annot=use_annot, fill=fill)
@@ -1,8 +1,16 @@
 from dataclasses import dataclass
-from typing import List, Tuple
-import fitz
-from PIL import Image
+from typing import List, Tuple, Optional, TYPE_CHECKING
+import fitz, re, os
 from .layout import LayoutAnalyzer
+from .utils import _shared_pool
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_WS = re.compile(r"\s+")
+
+def _key_x0(it):
+    return it[0][0]
 
 @dataclass
 class HybridSegment:
@@ -37,55 +45,57 @@ def extract_blocks_with_segments(doc: fitz.Document) -> List[HybridBlock]:
     blocks: List[HybridBlock] = []
     try:
         PRES = fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_PRESERVE_LIGATURES
-        getter = lambda p: p.get_textpage(flags=PRES).extractRAWDICT()
     except Exception:
-        getter = lambda p: p.get_text("rawdict")
+        PRES = None
 
     for pno in range(len(doc)):
-        raw = getter(doc[pno])
+        if PRES is not None:
+            # One TextPage per page. DICT is enough here: we only need span text/bbox/size,
+            # so skip materializing the per-char dicts RAWDICT would build.
+            tp = doc[pno].get_textpage(flags=PRES)
+            raw = tp.extractDICT()
+            del tp
+        else:
+            raw = doc[pno].get_text("dict")
         for b in raw.get("blocks", []):
             if "lines" not in b: 
                 continue
-            brect = tuple(map(float, b.get("bbox", (0, 0, 0, 0))))
+            brect = b.get("bbox") or (0.0, 0.0, 0.0, 0.0)  # MuPDF bboxes are float tuples already
             lines: List[HybridLine] = []
-            block_text_lines: List[str] = []
+            raw_lines = b.get("lines", [])
+            block_text_lines: List[str] = [None] * len(raw_lines)
+            bi = 0
 
             bw = max(1.0, brect[2] - brect[0])
             SEG_GAP = max(10.0, 0.12 * bw)  # 12% of block width or 10 px
 
-            for ln in b.get("lines", []):
+            for ln in raw_lines:
                 spans = ln.get("spans", [])
                 if not spans:
                     continue
-                pieces = []  # (bbox, text, size)
-                rects  = []
-                sizes  = []
-                for sp in spans:
-                    if isinstance(sp.get("text"), str) and sp["text"].strip():
-                        t = " ".join(sp["text"].split())
-                        bb = tuple(map(float, sp.get("bbox", brect)))
-                    else:
-                        chars = sp.get("chars") or []
-                        t = "".join(ch.get("c", "") for ch in chars).strip()
-                        if chars:
-                            xs0 = [c["bbox"][0] for c in chars if "bbox" in c]
-                            ys0 = [c["bbox"][1] for c in chars if "bbox" in c]
-                            xs1 = [c["bbox"][2] for c in chars if "bbox" in c]
-                            ys1 = [c["bbox"][3] for c in chars if "bbox" in c]
-                            bb = (min(xs0), min(ys0), max(xs1), max(ys1)) if xs0 else tuple(map(float, brect))
-                        else:
-                            bb = tuple(map(float, brect))
+                # sized up front: one allocation per line instead of append growth
+                n = len(spans)
+                pieces = [None] * n  # (bbox, text, size)
+                rects  = [None] * n
+                sizes  = [0.0] * n
+                pi = 0
+                for i, sp in enumerate(spans):
+                    # a blank span adds no text, but its box still counts toward the line's
+                    t = _WS.sub(" ", sp["text"]).strip() if isinstance(sp.get("text"), str) else ""
+                    bb = sp.get("bbox") or brect
+                    sz = float(sp.get("size", 11.5))
                     if t:
-                        pieces.append((bb, t, float(sp.get("size", 11.5))))
-                    rects.append(bb)
-                    sizes.append(float(sp.get("size", 11.5)))
-                if not pieces:
+                        pieces[pi] = (bb, t, sz); pi += 1
+                    rects[i] = bb
+                    sizes[i] = sz
+                if not pi:
                     continue
+                del pieces[pi:]
 
                 x0 = min(r[0] for r in rects); y0 = min(r[1] for r in rects)
                 x1 = max(r[2] for r in rects); y1 = max(r[3] for r in rects)
 
-                pieces.sort(key=lambda it: it[0][0])  # left x
+                pieces.sort(key=_key_x0)  # left x
                 segments: List[HybridSegment] = []
                 cur_texts, cur_rects, cur_sizes = [], [], []
                 last_x1 = None
@@ -105,23 +115,39 @@ def extract_blocks_with_segments(doc: fitz.Document) -> List[HybridBlock]:
 
                 line_text = " ".join(it[1] for it in pieces)
                 lines.append(HybridLine((x0, y0, x1, y1), line_text, segments))
-                block_text_lines.append(line_text)
+                block_text_lines[bi] = line_text; bi += 1
 
             if not lines:
                 continue
-            block_text = "\n".join(block_text_lines).strip()
-            blocks.append(HybridBlock(pno, brect, lines, block_text))
-            if not lines:
-                continue
-            block_text = "\n".join(block_text_lines).strip()
+            del block_text_lines[bi:]
+            # every line_text is built from stripped, non-empty pieces: no strip() copy needed
+            block_text = "\n".join(block_text_lines)
             blocks.append(HybridBlock(pno, brect, lines, block_text))
     return blocks
 
-def extract_blocks_from_layout(doc: fitz.Document, analyzer: LayoutAnalyzer) -> List[HybridBlock]:
+# Below this many pages rasterizing in-process beats shipping page images between processes
+_PARALLEL_MIN_LAYOUT_PAGES = 8
+
+def _render_for_layout_worker(path: str, pno: int, dpi: int) -> Tuple[int, int, bytes]:
+    """Worker: (width, height, RGB samples) of page `pno` of the file at `path` rendered at `dpi`."""
+    with fitz.open(path) as doc:
+        pix = doc[pno].get_pixmap(dpi=dpi)
+        return pix.width, pix.height, pix.samples
+
+def extract_blocks_from_layout(doc: fitz.Document, analyzer: LayoutAnalyzer,
+                               batch_size: int = 4, num_workers: Optional[int] = 1) -> List[HybridBlock]:
     """
-    Uses AI Layout Analyzer to discover blocks, then extracts text/lines from those blocks
-    using PyMuPDF with 'clip'.
+    Uses AI Layout Analyzer to discover blocks, then assigns the page's text lines
+    (extracted once per page with PyMuPDF) to the block containing each line's center.
+    Pages are sent to the analyzer `batch_size` at a time so the model runs one
+    forward pass per batch instead of per page (keep it small on low-VRAM GPUs).
+    With num_workers > 1 (None: up to 4) and a document opened from a file, pages are
+    rasterized on the shared process pool, the next batch while the model runs this one.
     """
+    # imported here so text-only modes never load PIL/numpy
+    import numpy as np
+    from PIL import Image
+
     blocks: List[HybridBlock] = []
     
     try:
@@ -131,98 +157,165 @@ def extract_blocks_from_layout(doc: fitz.Document, analyzer: LayoutAnalyzer) ->
     except Exception:
         pass
 
-    for pno in range(len(doc)):
-        page = doc[pno]
-        
-        # 1. Rasterize for AI
+    batch_size = max(1, int(batch_size))
+    if num_workers is None:
+        num_workers = min(os.cpu_count() or 1, 4)
+    n = len(doc)
+    pool = (_shared_pool(num_workers) if num_workers > 1 and n >= _PARALLEL_MIN_LAYOUT_PAGES
+            and doc.name and os.path.isfile(doc.name) else None)
+
+    def submit(start: int) -> list:
+        # one batch of renders in flight ahead of the model, not the whole document in memory
+        return [pool.submit(_render_for_layout_worker, doc.name, pno, 150)
+                for pno in range(start, min(start + batch_size, n))]
+
+    ahead = submit(0) if pool is not None else None
+    for start in range(0, n, batch_size):
+        pnos = range(start, min(start + batch_size, n))
+
+        # 1. Rasterize the batch for AI
         # Use lower DPI for speed if model allows, but Surya settings usually handle resizing.
         # We give it decent quality.
-        pix = page.get_pixmap(dpi=150) 
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        
-        # 2. Get Layout BBoxes (pixels relative to image size)
+        if pool is not None:
+            rendered = [fut.result() for fut in ahead]
+            ahead = submit(start + batch_size) if start + batch_size < n else None
+            imgs = [Image.frombuffer("RGB", (w, h), buf, "raw", "RGB", 0, 1) for w, h, buf in rendered]
+            dims = [(w, h) for w, h, _ in rendered]
+            rendered = None
+        else:
+            pixes = [doc[pno].get_pixmap(dpi=150) for pno in pnos]
+            # frombuffer shares the pixmap's sample memory instead of copying W*H*3 bytes;
+            # `pixes` keeps the buffers alive until the analyzer is done with `imgs`.
+            imgs = [Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
+                    for pix in pixes]
+            dims = [(pix.width, pix.height) for pix in pixes]
+
+        # 2. Get Layout BBoxes (pixels relative to image size), one list per page
         # Note: Surya returns coords relative to the image we passed.
         # PyMuPDF expects coords in PDF points.
         # We must scale.
-        
-        ai_boxes = analyzer.analyze_page(img) # [[x0, y0, x1, y1], ...]
-        
-        # Calculate scale factors
-        # pix.width is pixels, page.rect.width is points
-        sx = page.rect.width / pix.width
-        sy = page.rect.height / pix.height
-        
-        for box in ai_boxes:
-            # Scale box to PDF points
-            # box is x0, y0, x1, y1
-            r_px = list(box)
-            r_pt = fitz.Rect(r_px[0]*sx, r_px[1]*sy, r_px[2]*sx, r_px[3]*sy)
-            
-            # Clip might be slightly off, maybe expand a tiny bit?
+        all_boxes = analyzer.analyze_pages(imgs) # [[[x0, y0, x1, y1], ...], ...]
+
+        # Only the pixel sizes are needed from here on: release the page images now
+        # rather than whenever the GC gets to them (tens of MB per page at 150 DPI).
+        imgs = None; pixes = None
+
+        for pno, (pw, ph), ai_boxes in zip(pnos, dims, all_boxes):
+            page = doc[pno]
+
+            # Calculate scale factors
+            # pw is pixels, page.rect.width is points
+            sx = page.rect.width / pw
+            sy = page.rect.height / ph
+
+            # Scale boxes to PDF points (box is x0, y0, x1, y1)
             # Surya boxes are usually tight.
-            
-            # 3. Extract text from this region
-            # We use the same parsing logic as 'extract_blocks_with_segments' 
-            # effectively treating this AI box as a single "block".
-            
-            # We fetch rawdict for this CLIP
+            if not len(ai_boxes):
+                continue
+            arr = np.asarray(ai_boxes, dtype=np.float64).reshape(-1, 4)
+            arr *= np.array([sx, sy, sx, sy])
+            r_pts = arr.tolist()
+
+            # 3. Extract the page text once and hand each PDF line to the AI box that
+            # contains its center, instead of re-parsing the page per box with clip=.
+            # Each AI box is then treated as a single "block".
             try:
-                raw = page.get_text("dict", clip=r_pt, flags=fitz.TEXT_PRESERVE_WHITESPACE)
+                raw = page.get_text("dict", flags=fitz.TEXT_PRESERVE_WHITESPACE)
             except:
-                raw = page.get_text("dict", clip=r_pt)
-                
-            lines: List[HybridLine] = []
-            block_text_lines: List[str] = []
-            
-            # Rawdict returns {blocks: [...]}, inside blocks are lines...
+                raw = page.get_text("dict")
+
+            # (rect, text, sizes) of every non-empty PDF line on the page
+            page_lines = []
+
             for b in raw.get("blocks", []):
                 for ln in b.get("lines", []):
                     spans = ln.get("spans", [])
                     if not spans: continue
-                    
+
                     # Reconstruct pieces
                     pieces = []
                     rects, sizes = [], []
                     for sp in spans:
-                        t = sp.get("text", "").strip()
+                        t = _WS.sub(" ", sp.get("text", "")).strip()
                         if not t: continue
-                        bbox = tuple(map(float, sp.get("bbox", r_pt)))
+                        bbox = sp["bbox"]
                         size = float(sp.get("size", 11.5))
                         pieces.append((bbox, t, size))
                         rects.append(bbox); sizes.append(size)
-                    
+
                     if not pieces: continue
-                    
+
                     # One hybrid line per PDF line
                     x0=min(r[0] for r in rects); y0=min(r[1] for r in rects)
                     x1=max(r[2] for r in rects); y1=max(r[3] for r in rects)
-                    
+
                     # For AI layout, we assume the AI *already* split columns.
                     # So we don't need the complex SEG_GAP splitting logic *inside* the box,
                     # unless it's a table cell detection issue.
                     # But Surya Layout detects *columns* and *paragraphs*.
-                    # Let's assume we treat the line as a single segment for simplicity, 
-                    # OR we can keep the segment logic just in case.
                     # Let's keep it simple: 1 segment per line.
-                    
+
                     line_text = " ".join(p[1] for p in pieces)
-                    # Create one segment for the whole line
-                    seg = HybridSegment((x0,y0,x1,y1), line_text, sizes)
-                    
-                    lines.append(HybridLine((x0,y0,x1,y1), line_text, [seg]))
-                    block_text_lines.append(line_text)
-            
-            if not lines: continue
-            
-            # Create HybridBlock
-            # We use the AI box as the rect, or the union of lines?
-            # AI box is safer for placement.
-            block_text = "\n".join(block_text_lines)
-            blocks.append(HybridBlock(pno, tuple(r_pt), lines, block_text))
-            
+                    page_lines.append(((x0,y0,x1,y1), line_text, sizes))
+
+            if not page_lines:
+                continue
+
+            # Line centers vs AI boxes as one (lines x boxes) containment matrix; each line
+            # goes to the first box holding its center. Half-open and in float32, like
+            # fitz.Rect.contains(Point) (MuPDF's fz_is_point_inside_rect).
+            lb = np.asarray([pl[0] for pl in page_lines], dtype=np.float64)
+            cx = ((lb[:, 0] + lb[:, 2]) / 2).astype(np.float32)[:, None]
+            cy = ((lb[:, 1] + lb[:, 3]) / 2).astype(np.float32)[:, None]
+            bx = arr.astype(np.float32)
+            inside = ((cx >= bx[:, 0]) & (cx < bx[:, 2]) & (cy >= bx[:, 1]) & (cy < bx[:, 3]))
+            box_of_line = np.where(inside.any(axis=1), inside.argmax(axis=1), -1).tolist()
+
+            lines_by_box: List[List[HybridLine]] = [[] for _ in r_pts]
+            for (rect, line_text, sizes), i in zip(page_lines, box_of_line):
+                if i < 0: continue  # outside every AI box
+                # Create one segment for the whole line
+                seg = HybridSegment(rect, line_text, sizes)
+                lines_by_box[i].append(HybridLine(rect, line_text, [seg]))
+
+            for r_pt, lines in zip(r_pts, lines_by_box):
+                if not lines: continue
+
+                # Create HybridBlock
+                # We use the AI box as the rect, or the union of lines?
+                # AI box is safer for placement.
+                block_text = "\n".join(ln.text for ln in lines)
+                blocks.append(HybridBlock(pno, tuple(r_pt), lines, block_text))
+
     return blocks
 
 
+def _merge_bands(bands: "np.ndarray", tol: float = 8.0) -> "np.ndarray":
+    """
+    Merge (N, 2) x-intervals that overlap (within `tol`) into column bands.
+    Returns an (M, 2) array of merged (x0, x1), left to right.
+    """
+    import numpy as np
+    if not len(bands):
+        return bands.reshape(0, 2)
+    bands = bands[np.lexsort((bands[:, 1], bands[:, 0]))]
+    ends = np.maximum.accumulate(bands[:, 1])
+    # a band opens a new column when it starts right of everything seen so far
+    new_start = np.empty(len(bands), dtype=bool)
+    new_start[0] = True
+    new_start[1:] = bands[1:, 0] > (ends[:-1] - tol)
+    idx = np.flatnonzero(new_start)
+    return np.column_stack((bands[idx, 0], np.maximum.reduceat(bands[:, 1], idx)))
+
+
+def _segment_bands(hb: "HybridBlock") -> "np.ndarray":
+    import numpy as np
+    return np.fromiter(
+        (c for ln in hb.lines for seg in ln.segments for c in seg.rect[::2]),
+        dtype=float, count=-1,
+    ).reshape(-1, 2)
+
+
 def is_table_like(hb: HybridBlock) -> bool:
     """
     Heuristic: if >=30% of lines have 2+ segments OR there are >=2 persistent x-bands,
@@ -230,40 +323,37 @@ def is_table_like(hb: HybridBlock) -> bool:
     """
     if not hb.lines:
         return False
-    multi = sum(1 for ln in hb.lines if len(ln.segments) >= 2)
-    if multi >= max(2, int(0.3 * len(hb.lines))):
-        return True
-
-    bands = []
+    threshold = max(2, (3 * len(hb.lines)) // 10)
+    multi = 0
     for ln in hb.lines:
-        for seg in ln.segments:
-            bands.append((seg.rect[0], seg.rect[2]))
-    if not bands:
+        if len(ln.segments) >= 2:
+            multi += 1
+            if multi >= threshold:
+                return True
+
+    bands = _segment_bands(hb)
+    if not len(bands):
         return False
-    bands.sort()
-    merged = []
-    tol = 8.0
-    for x0, x1 in bands:
-        if not merged or x0 > (merged[-1][1] - tol):
-            merged.append([x0, x1])
-        else:
-            merged[-1][1] = max(merged[-1][1], x1)
-    return len(merged) >= 2
+    return len(_merge_bands(bands)) >= 2
 
 
 def build_columns(hb: HybridBlock) -> List[Tuple[float, float]]:
-    bands = []
-    for ln in hb.lines:
-        for seg in ln.segments:
-            bands.append((seg.rect[0], seg.rect[2]))
-    if not bands:
+    bands = _segment_bands(hb)
+    if not len(bands):
         return [(hb.rect[0], hb.rect[2])]
-    bands.sort()
-    cols = []
-    tol = 8.0
-    for x0, x1 in bands:
-        if not cols or x0 > (cols[-1][1] - tol):
-            cols.append([x0, x1])
-        else:
-            cols[-1][1] = max(cols[-1][1], x1)
-    return [(c[0], c[1]) for c in cols]
\ No newline at end of file
+    return [(float(x0), float(x1)) for x0, x1 in _merge_bands(bands)]
+
+
+def best_columns(hb: HybridBlock, cols: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """
+    Column with the largest horizontal overlap for every segment of `hb`, in line/segment
+    order (first column wins ties). One broadcast over segments x columns per block.
+    """
+    import numpy as np
+    segs = _segment_bands(hb)
+    if not len(segs):
+        return []
+    c = np.asarray(cols, dtype=float).reshape(-1, 2)
+    ov = np.minimum(segs[:, 1, None], c[:, 1]) - np.maximum(segs[:, 0, None], c[:, 0])
+    idx = np.maximum(ov, 0.0).argmax(axis=1)
+    return [cols[i] for i in idx.tolist()]
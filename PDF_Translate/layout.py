@@ -1,12 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Any
-import fitz
-from PIL import Image
-import numpy as np
+from typing import List, Tuple, Any, TYPE_CHECKING
+import logging
+from contextlib import nullcontext
+from functools import lru_cache
+
+if TYPE_CHECKING:  # PIL is only needed once a page is actually rasterized
+    from PIL import Image
+
+log = logging.getLogger(__name__)
 
 class LayoutAnalyzer(ABC):
     @abstractmethod
-    def analyze_page(self, page_image: Image.Image) -> List[Tuple[float, float, float, float]]:
+    def analyze_page(self, page_image: "Image.Image") -> List[Tuple[float, float, float, float]]:
         """
         Analyze page image and return list of bounding boxes (x0, y0, x1, y1) for text regions.
         Coordinates should be scaling-independent or relative to the image size, 
@@ -15,6 +20,13 @@ class LayoutAnalyzer(ABC):
         """
         pass
 
+    def analyze_pages(self, page_images: List["Image.Image"]) -> List[List[Tuple[float, float, float, float]]]:
+        """
+        Batched variant of analyze_page: one list of bboxes per input image, in order.
+        Default runs analyze_page per image; backends that can batch should override it.
+        """
+        return [self.analyze_page(img) for img in page_images]
+
 class SuryaLayoutAnalyzer(LayoutAnalyzer):
     def __init__(self):
         try:
@@ -23,45 +35,58 @@ class SuryaLayoutAnalyzer(LayoutAnalyzer):
             self.layout_predictor = None
         except ImportError:
              raise ImportError("Failed to import surya.detection.DetectionPredictor. Please ensure surya-ocr >= 0.6.0 is installed.")
+        try:
+            import torch  # already loaded by surya
+        except ImportError:
+            self._inference = nullcontext
+        else:
+            # Surya resizes every page to the model's fixed input size, so cuDNN can pick
+            # its convolution algorithms once and keep them
+            torch.backends.cudnn.benchmark = True
+            self._inference = torch.inference_mode
 
-    def analyze_page(self, page_image: Image.Image) -> List[Tuple[float, float, float, float]]:
+    def analyze_page(self, page_image: "Image.Image") -> List[Tuple[float, float, float, float]]:
         """
         Returns list of bboxes [x0, y0, x1, y1] for detected text regions.
         Prioritizes Layout Analysis (blocks) if available, falls back to Text Detection (lines).
         """
+        return self.analyze_pages([page_image])[0]
+
+    def analyze_pages(self, page_images: List["Image.Image"]) -> List[List[Tuple[float, float, float, float]]]:
+        """
+        Same as analyze_page for several images, run through the predictor in a single
+        call so the model batches them (one forward pass instead of one per page).
+        """
         # 1. Try Layout Analysis first (better for blocks)
         try:
             if self.layout_predictor is None:
                 from surya.layout import LayoutPredictor
                 self.layout_predictor = LayoutPredictor()
                 
-            results = self.layout_predictor([page_image])
-            res = results[0]
+            with self._inference():
+                results = self.layout_predictor(page_images)
             
-            output_boxes = []
-            for item in res.bboxes:
-                # LayoutBox has bbox [x0, y0, x1, y1]
-                output_boxes.append(tuple(item.bbox))
-                
-            return output_boxes
+            # LayoutBox has bbox [x0, y0, x1, y1]
+            return [[tuple(item.bbox) for item in res.bboxes] for res in results]
             
         except ImportError:
             pass # No layout module, strictly stick to text detection
         except Exception as e:
-            print(f"Surya Layout Analysis failed: {e}. Falling back to Text Detection.")
+            log.warning("Surya Layout Analysis failed: %s. Falling back to Text Detection.", e)
 
         # 2. Fallback to Text Detection (lines)
-        results = self.predictor([page_image])
-        res = results[0]
+        with self._inference():
+            results = self.predictor(page_images)
         
-        boxes = []
-        for item in res.bboxes:
-             # TextLine bbox is [x0, y0, x1, y1]
-             boxes.append(tuple(item.bbox))
-             
-        return boxes
+        # TextLine bbox is [x0, y0, x1, y1]
+        return [[tuple(item.bbox) for item in res.bboxes] for res in results]
 
+@lru_cache(maxsize=4)
 def get_layout_analyzer(method: str) -> LayoutAnalyzer:
+    """
+    The analyzer for `method`, created once per process: loading the models is the slow
+    (and, on a GPU, memory-hungry) part, so every run shares the same instance.
+    """
     if method == "Surya":
         return SuryaLayoutAnalyzer()
     else:
@@ -1,22 +1,80 @@
+from typing import Tuple, Optional
+from collections import deque
 import fitz, subprocess, shutil, os
+import logging
+from .utils import _shared_pool
 
-def rasterize_pdf_to_image_pdf(input_path: str, dpi: int = 300) -> str:
+log = logging.getLogger(__name__)
+
+def _render_page(input_path: str, pno: int, zoom: float) -> Tuple[int, int, bytes]:
+    """Worker: rasterize one page in its own process; (width, height, raw RGB samples), lossless."""
+    doc = fitz.open(input_path)
+    try:
+        pix = doc[pno].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return pix.width, pix.height, pix.samples
+    finally:
+        doc.close()
+
+def rasterize_pdf_to_image_pdf(input_path: str, dpi: int = 300, num_workers: Optional[int] = 1) -> str:
     doc = fitz.open(input_path); tmp_dir = "temp"; os.makedirs(tmp_dir, exist_ok=True)
     out_path = os.path.join(tmp_dir, "rasterized.pdf")
-    out = fitz.open(); zoom = dpi/72.0; mat = fitz.Matrix(zoom, zoom)
+    out = fitz.open(); zoom = dpi/72.0
+    if num_workers is None:
+        num_workers = min(os.cpu_count() or 1, 4)
     try:
-        for pno in range(len(doc)):
-            page = doc[pno]; pix = page.get_pixmap(matrix=mat, alpha=False)
-            po = out.new_page(width=page.rect.width, height=page.rect.height)
-            po.insert_image(po.rect, stream=pix.tobytes("png"))
+        if num_workers > 1 and len(doc) > 1:
+            # Pages are independent: render them in parallel (MuPDF rasterizing is CPU-bound),
+            # insert sequentially here so page order is preserved. The same pixels as the serial path.
+            # Raw pages are ~25 MB each at 300 DPI: keep only 2 per worker in flight, not the document.
+            n = len(doc); pool = _shared_pool(num_workers)
+            ahead = deque(pool.submit(_render_page, input_path, pno, zoom)
+                          for pno in range(min(2 * num_workers, n)))
+            for pno in range(n):
+                w, h, samples = ahead.popleft().result()
+                if pno + len(ahead) + 1 < n:
+                    ahead.append(pool.submit(_render_page, input_path, pno + len(ahead) + 1, zoom))
+                page = doc[pno]
+                po = out.new_page(width=page.rect.width, height=page.rect.height)
+                po.insert_image(po.rect, pixmap=fitz.Pixmap(fitz.csRGB, w, h, samples, False))
+        else:
+            for pno in range(len(doc)):
+                page = doc[pno]; pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                po = out.new_page(width=page.rect.width, height=page.rect.height)
+                # Hand the Pixmap over directly: no PNG encode here + decode in insert_image.
+                po.insert_image(po.rect, pixmap=pix)
+                pix = None
         out.save(out_path)
     finally:
         out.close(); doc.close()
     return out_path
 
-def ocr_fix_pdf(input_path: str, lang: str, dpi: str, optimize: str, progress_callback=None) -> str:
+def _pump_stderr(proc, progress_callback, prefix: str) -> None:
+    """Forward ocrmypdf's stderr lines to the callback; just drain the pipe if there is none."""
+    cb = progress_callback
+    if cb:
+        for line in proc.stderr:
+            s = line.strip()
+            if s:
+                cb(prefix + s)
+    else:
+        proc.stderr.read()  # drain so the child never blocks on a full pipe
+
+def needs_ocr(input_path: str, sample_pages: int = 5, min_chars: int = 20) -> bool:
+    """
+    False when one of the first `sample_pages` pages already carries a text layer (more than
+    `min_chars` non-whitespace characters). Only consulted on request (--skip-ocr-if-text):
+    ocr_fix_pdf deliberately replaces existing text layers, which are often broken for Devanagari.
+    """
+    with fitz.open(input_path) as doc:
+        for pno in range(min(sample_pages, len(doc))):
+            if len("".join(doc[pno].get_text("text").split())) > min_chars:
+                return False
+    return True
+
+def ocr_fix_pdf(input_path: str, lang: str, dpi: str, optimize: str, progress_callback=None,
+                num_workers: Optional[int] = 1) -> str:
     if shutil.which("ocrmypdf") is None:
-        print("[ocrmypdf] not found; using original.")
+        log.warning("[ocrmypdf] not found; using original.")
         return input_path
     
     out_dir = "temp"
@@ -28,29 +86,24 @@ def ocr_fix_pdf(input_path: str, lang: str, dpi: str, optimize: str, progress_ca
         "--image-dpi", dpi, "--oversample", dpi, "--optimize", optimize,
         os.fspath(input_path), os.fspath(output_path)
     ]
-    print("[ocrmypdf]", " ".join(cmd))
+    log.info("[ocrmypdf] %s", " ".join(cmd))
     
     # Run with Popen to capture stderr (where ocrmypdf writes progress)
-    with subprocess.Popen(cmd, stderr=subprocess.PIPE, text=True, bufsize=1, encoding="utf-8", errors="replace") as proc:
-        for line in proc.stderr:
-            line = line.strip()
-            if line:
-                # print(f"[OCR-LOG] {line}") # Debug
-                if progress_callback:
-                    progress_callback(f"OCR: {line}")
+    with subprocess.Popen(cmd, stderr=subprocess.PIPE, text=True, bufsize=65536, encoding="utf-8", errors="replace") as proc:
+        _pump_stderr(proc, progress_callback, "OCR: ")
     
     if proc.returncode == 0:
-        print("[ocrmypdf] success ->", output_path)
+        log.info("[ocrmypdf] success -> %s", output_path)
         return output_path
         
-    print("[ocrmypdf] failed; fallback to rasterize.")
+    log.warning("[ocrmypdf] failed; fallback to rasterize.")
     
     # Fallback to rasterization
     try:
         if progress_callback: progress_callback("OCR failed, trying rasterization fallback...")
-        image_pdf = rasterize_pdf_to_image_pdf(input_path, dpi=300)
+        image_pdf = rasterize_pdf_to_image_pdf(input_path, dpi=300, num_workers=num_workers)
     except Exception as e:
-        print("[fallback] rasterize failed:", e)
+        log.warning("[fallback] rasterize failed: %s", e)
         return input_path
         
     output_path2 = os.path.join(out_dir, "ocr_fixed_from_image.pdf")
@@ -59,17 +112,14 @@ def ocr_fix_pdf(input_path: str, lang: str, dpi: str, optimize: str, progress_ca
         "--image-dpi", dpi, "--oversample", dpi, "--optimize", optimize,
         os.fspath(image_pdf), os.fspath(output_path2)
     ]
-    print("[ocrmypdf fallback]", " ".join(cmd2))
+    log.info("[ocrmypdf fallback] %s", " ".join(cmd2))
     
-    with subprocess.Popen(cmd2, stderr=subprocess.PIPE, text=True, bufsize=1, encoding="utf-8", errors="replace") as proc2:
-        for line in proc2.stderr:
-            line = line.strip()
-            if line and progress_callback:
-                progress_callback(f"OCR (Fallback): {line}")
+    with subprocess.Popen(cmd2, stderr=subprocess.PIPE, text=True, bufsize=65536, encoding="utf-8", errors="replace") as proc2:
+        _pump_stderr(proc2, progress_callback, "OCR (Fallback): ")
 
     if proc2.returncode == 0:
-        print("[ocrmypdf] success via rasterize ->", output_path2)
+        log.info("[ocrmypdf] success via rasterize -> %s", output_path2)
         return output_path2
         
-    print("[ocrmypdf] fallback failed; using original.")
+    log.warning("[ocrmypdf] fallback failed; using original.")
     return input_path
\ No newline at end of file
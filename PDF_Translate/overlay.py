@@ -1,13 +1,43 @@
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Tuple, List, Dict, Optional, Any
 from pathlib import Path
 from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont
-from .utils import rect_iou, rect_center, _rel_luminance, point_in_rect, _to_rgb, Span, _dominant_script
-from .constants import _DEV, _LAT
+from .utils import rect_iou, rect_center, _color_luminance, point_in_rect, Span, SpanIndex, _dominant_script, _median
 from .textlayer import extract_spans_from_textlayer, map_block_styles_from_spans, translate_text#,  derive_block_styles_from_spans
 from .hybrid import extract_blocks_with_segments
-import json, fitz, os, statistics
-
+import json, fitz, os
+
+
+@dataclass(frozen=True, slots=True)
+class OverlayConfig:
+    """Overlay-mode render knobs, passed to run_mode as one object."""
+    render: str = "image"        # "image" | "textbox"
+    align: int = 0               # 0=left, 1=center, 2=right, 3=justify
+    line_spacing: float = 1.10
+    margin_px: float = 0.1
+    target_dpi: int = 600
+    scale_x: float = 1.0
+    scale_y: float = 1.0
+    off_x: float = 0.0
+    off_y: float = 0.0
+
+DEFAULT_OVERLAY = OverlayConfig()
+
+@dataclass(slots=True)
+class OverlayItem:
+    """One overlay entry (the dicts of overlay_load_items / build_overlay_items_from_doc) with attribute access."""
+    page: int
+    bbox: Tuple[float, float, float, float]
+    text: str = ""
+    translated_text: str = ""
+    fontsize: float = 11.5
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "OverlayItem":
+        return cls(int(d["page"]), tuple(d["bbox"]), d.get("text") or "",
+                   d.get("translated_text") or "", float(d.get("fontsize", 11.5)))
 
 # ========= JSON overlay helpers (ADD) =========
 def overlay_load_items(json_path: str) -> List[Dict[str, Any]]:
@@ -40,11 +70,15 @@ def overlay_choose_fontfile_for_text(txt: str,
                                      font_en_path: Optional[str],
                                      font_hi_path: Optional[str]) -> Optional[str]:
     """Pick a font file by detected script; returns a single TTF path or None."""
-    dev = len(_DEV.findall(txt or "")); lat = len(_LAT.findall(txt or ""))
-    if dev >= lat:
-        return font_hi_path if (font_hi_path and os.path.exists(font_hi_path)) else font_en_path
-    else:
-        return font_en_path if (font_en_path and os.path.exists(font_en_path)) else font_hi_path
+    # _dominant_script is memoized; a Devanagari/Latin tie ("auto") goes to the Hindi font
+    if _dominant_script(txt or "") != "en":
+        return _existing_or(font_hi_path, font_en_path)
+    return _existing_or(font_en_path, font_hi_path)
+
+@lru_cache(maxsize=32)
+def _existing_or(preferred: Optional[str], fallback: Optional[str]) -> Optional[str]:
+    # the same two font paths come in for every overlay item; stat them once
+    return preferred if (preferred and os.path.exists(preferred)) else fallback
 
 def overlay_draw_text_as_image(page: fitz.Page,
                                rect: fitz.Rect,
@@ -60,10 +94,30 @@ def overlay_draw_text_as_image(page: fitz.Page,
     """
     if not text or rect.is_empty:
         return
+    stream = overlay_render_text_png(rect.width, rect.height, text, base_fontsize_pt, fontfile,
+                                     target_dpi, line_spacing, align, margin_px)
+    if stream is not None:
+        page.insert_image(rect, stream=stream, keep_proportion=False, overlay=True)
+
+def overlay_render_text_png(width_pt: float,
+                            height_pt: float,
+                            text: str,
+                            base_fontsize_pt: float,
+                            fontfile: Optional[str],
+                            target_dpi: int = 600,
+                            line_spacing: float = 1.10,
+                            align: int = 0,
+                            margin_px: float = 0.1) -> Optional[bytes]:
+    """
+    The rasterize + PNG-encode half of overlay_draw_text_as_image, for a width_pt x height_pt box.
+    Touches no PDF objects, so it can run in a worker process. None if the text cannot fit.
+    """
+    if not text:
+        return None
 
     # Compute pixel size from PDF points at target DPI
-    W = max(1, int(round(rect.width  / 72.0 * target_dpi)))
-    H = max(1, int(round(rect.height / 72.0 * target_dpi)))
+    W = max(1, int(round(width_pt  / 72.0 * target_dpi)))
+    H = max(1, int(round(height_pt / 72.0 * target_dpi)))
 
     # Canvas
     img_mode = "L"                 # 8-bit gray
@@ -147,30 +201,40 @@ def overlay_draw_text_as_image(page: fitz.Page,
             ok, best_img = success, tmp
 
     if not ok or best_img is None:
-        return
+        return None
 
     buf = BytesIO()
     best_img.save(buf, format="PNG", optimize=True)
-    stream = buf.getvalue()
-    page.insert_image(rect, stream=stream, keep_proportion=False, overlay=True)
+    return buf.getvalue()
 
-def dominant_text_fill_for_rect(pno: int, rect: fitz.Rect, spans_by_page: Dict[int, List[Span]]) -> Tuple[float, float, float]:
+def dominant_text_fill_for_rect(pno: int, rect, spans_by_page: "Dict[int, List[Span]] | SpanIndex") -> Tuple[float, float, float]:
     """
-    Look at spans under/overlapping rect on this page; choose fill based on their average luminance.
-    Fallback to white if nothing found.
+    Look at spans under/overlapping rect (fitz.Rect or 4-tuple) on this page; choose fill based
+    on their average luminance. Fallback to white if nothing found. Pass a SpanIndex when querying many rects.
     """
+    rect = tuple(rect)
+    if isinstance(spans_by_page, SpanIndex):
+        lum = spans_by_page.luminances_near(pno, rect)
+        if not len(lum):
+            return (1.0, 1.0, 1.0)
+        return (0.0, 0.0, 0.0) if float(lum.mean()) >= 0.85 else (1.0, 1.0, 1.0)
+
     cand = []
     for sp in spans_by_page.get(pno, []):
-        if rect_iou(sp.rect, (rect.x0, rect.y0, rect.x1, rect.y1)) > 0.10 or \
-           point_in_rect(rect_center(sp.rect), (rect.x0, rect.y0, rect.x1, rect.y1)):
+        if rect_iou(sp.rect, rect) > 0.10 or point_in_rect(rect_center(sp.rect), rect):
             cand.append(sp.color)
     if not cand:
         return (1.0, 1.0, 1.0)  # safe default
 
-    lum = [_rel_luminance(_to_rgb(c)) for c in cand]
+    lum = [_color_luminance(c) for c in cand]
     avgL = sum(lum) / len(lum)
     return (0.0, 0.0, 0.0) if avgL >= 0.85 else (1.0, 1.0, 1.0)
 
+def dominant_text_fills_for_rects(pno: int, rects, span_index: SpanIndex) -> List[Tuple[float, float, float]]:
+    """dominant_text_fill_for_rect for every rect of one page in a single SpanIndex query."""
+    return [(0.0, 0.0, 0.0) if m >= 0.85 else (1.0, 1.0, 1.0)  # NaN (no spans) -> white
+            for m in span_index.mean_luminances(pno, rects).tolist()]
+
 def build_overlay_items_from_doc_v2(doc: fitz.Document,
                                  translate_dir: str) -> List[Dict[str, Any]]:
     """
@@ -204,10 +268,7 @@ def build_overlay_items_from_doc_v2(doc: fitz.Document,
                 original = (seg.text or "").strip()
                 if not original:
                     continue
-                try:
-                    base_size = statistics.median(seg.sizes)
-                except statistics.StatisticsError:
-                    base_size = bl.fontsize or 11.5
+                base_size = _median(seg.sizes) if seg.sizes else (bl.fontsize or 11.5)
 
                 translated = translate_text(original, sl, dl) or ""
 
@@ -251,10 +312,7 @@ def build_overlay_items_from_doc(doc: fitz.Document,
                     continue
 
                 # fontsize for this area
-                try:
-                    base_size = statistics.median(seg.sizes)
-                except statistics.StatisticsError:
-                    base_size = bl.fontsize or 11.5
+                base_size = _median(seg.sizes) if seg.sizes else (bl.fontsize or 11.5)
 
                 translated = translate_text(original, sl, dl) or ""
 
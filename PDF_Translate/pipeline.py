@@ -1,13 +1,57 @@
-from typing import List, Tuple, Dict, Optional, Any
-import fitz, os, zipfile, statistics, re
-from .utils import Span, pick_redact_fill_for_color, insert_text_fit, _dominant_script
-from .constants import _DEV
-from .textlayer import extract_blocks_from_textlayer, extract_lines_from_textlayer, extract_spans_from_textlayer, derive_line_styles_from_spans, derive_block_styles_from_spans, transfer_style_from_original, translate_text, batch_translate_text
-from .overlay import overlay_choose_fontfile_for_text, overlay_draw_text_as_image, overlay_transform_rect, dominant_text_fill_for_rect
-from .hybrid import extract_blocks_with_segments, is_table_like, build_columns, extract_blocks_from_layout
+from typing import List, Tuple, Dict, Optional, Any, Iterator
+import fitz, os, zipfile, re, logging
+import multiprocessing, queue, shutil, threading, weakref
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from .utils import Span, Line, Block, SpanIndex, pick_redact_fill_for_color, insert_text_fit, direction_picker, direction_requests, _median, _shared_pool, group_by_page, _base_range
+from .constants import _has_dev
+from .textlayer import load_translation_cache, save_translation_cache, extract_all_from_textlayer, derive_line_styles_from_spans, derive_block_styles_from_spans, transfer_style_from_original, translate_text, batch_translate_text
+from .overlay import OverlayConfig, OverlayItem, DEFAULT_OVERLAY, overlay_choose_fontfile_for_text, overlay_render_text_png, overlay_transform_rect, dominant_text_fills_for_rects
+from .hybrid import extract_blocks_with_segments, is_table_like, build_columns, best_columns, extract_blocks_from_layout
 from .font_matcher import FontMatcher
 
-def erase_original_text(out_doc: fitz.Document, spans: List[Span], mode: str, erase_mode: str, _unused_fill):
+log = logging.getLogger(__name__)
+
+def _pad_clip_rects(rects, fontsizes, clip: fitz.Rect):
+    """
+    Pad each (x0, y0, x1, y1) by max(1, 0.18 * fontsize) and clip it to `clip` in one NumPy pass
+    (fontsizes=None: clip only). Returns (indices, rects) for the rects that are still non-empty,
+    as plain lists.
+    """
+    import numpy as np
+    arr = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+    if fontsizes is not None:
+        pads = np.maximum(1.0, 0.18 * np.asarray(fontsizes, dtype=np.float64))
+        arr[:, :2] -= pads[:, None]
+        arr[:, 2:] += pads[:, None]
+    np.clip(arr[:, 0::2], clip.x0, clip.x1, out=arr[:, 0::2])
+    np.clip(arr[:, 1::2], clip.y0, clip.y1, out=arr[:, 1::2])
+    idx = np.flatnonzero((arr[:, 2] > arr[:, 0]) & (arr[:, 3] > arr[:, 1]))
+    return idx.tolist(), arr[idx].tolist()
+
+def _coalesce_rects(rects, fills, min_overlap: float = 1.0) -> List[Tuple[List[float], Tuple[float, ...]]]:
+    """
+    Merge rects with the same fill that sit on the same text line (>= 80% shared height)
+    and overlap horizontally by at least `min_overlap` pt. Padded neighbouring spans overlap,
+    so this cuts the redact annotations apply_redactions has to process.
+    Returns [[rect, fill], ...].
+    """
+    merged: List[list] = []
+    last: Dict[Tuple[float, ...], int] = {}  # fill -> index of the newest merged rect
+    for i in sorted(range(len(rects)), key=lambda i: (rects[i][1], rects[i][0])):
+        x0, y0, x1, y1 = rects[i]; f = fills[i]
+        j = last.get(f)
+        if j is not None:
+            m = merged[j][0]
+            shared_h = min(y1, m[3]) - max(y0, m[1])
+            if shared_h >= 0.8 * min(y1 - y0, m[3] - m[1]) and min(x1, m[2]) - max(x0, m[0]) >= min_overlap:
+                merged[j][0] = [min(x0, m[0]), min(y0, m[1]), max(x1, m[2]), max(y1, m[3])]
+                continue
+        last[f] = len(merged)
+        merged.append([[x0, y0, x1, y1], f])
+    return merged
+
+def erase_original_text(out_doc: fitz.Document, spans: List[Span], mode: str, erase_mode: str, _unused_fill,
+                        spans_by_page: Optional[Dict[int, List[Span]]] = None):
     """
     Dynamic per-span fill:
       - if span text color is light -> redact black
@@ -16,37 +60,250 @@ def erase_original_text(out_doc: fitz.Document, spans: List[Span], mode: str, er
     if erase_mode not in ("mask", "redact"):
         return
 
-    spans_by_page: Dict[int, List[Span]] = {}
-    for sp in spans:
-        spans_by_page.setdefault(sp.page, []).append(sp)
+    if spans_by_page is None:
+        spans_by_page = group_by_page(spans)
 
     for pno, sps in spans_by_page.items():
         page = out_doc[pno]
+        keep, rects = _pad_clip_rects([sp.rect for sp in sps], [sp.fontsize for sp in sps], page.rect)
         if erase_mode == "mask":
-            for sp in sps:
-                pad = max(1.0, 0.18 * sp.fontsize)
-                r = fitz.Rect(*sp.rect)
-                r = fitz.Rect(r.x0 - pad, r.y0 - pad, r.x1 + pad, r.y1 + pad) & page.rect
-                if r.is_empty:
-                    continue
-                fill = pick_redact_fill_for_color(sp.color)
+            for i, r in zip(keep, rects):
+                fill = pick_redact_fill_for_color(sps[i].color)
                 page.draw_rect(r, color=None, fill=fill, overlay=True, width=0)
         else:
-            added_any = False
-            for sp in sps:
-                pad = max(1.0, 0.18 * sp.fontsize)
-                r = fitz.Rect(*sp.rect)
-                r = fitz.Rect(r.x0 - pad, r.y0 - pad, r.x1 + pad, r.y1 + pad) & page.rect
-                if r.is_empty:
-                    continue
-                fill = pick_redact_fill_for_color(sp.color)
+            fills = [pick_redact_fill_for_color(sps[i].color) for i in keep]
+            for r, fill in _coalesce_rects(rects, fills):
                 page.add_redact_annot(r, fill=fill)
-                added_any = True
-            if added_any:
+            if keep:
                 try:
                     page.apply_redactions()
                 except Exception as e:
-                    print(f"[page {pno}] apply_redactions error: {e}")
+                    log.warning("[page %d] apply_redactions error: %s", pno, e)
+
+# Below this many pages to draw, process start-up costs more than it saves.
+_PARALLEL_MIN_PAGES = 16
+
+# Overlay images are rendered in worker processes from this many up.
+_PARALLEL_MIN_IMAGES = 32
+
+# One text draw: (rect, text, fontname, base_size, color, fontfile). Plain tuples so they pickle.
+DrawOp = Tuple[Tuple[float, float, float, float], str, str, float, Tuple[float, ...], Optional[str]]
+
+def _target_script(text_out: str) -> str:
+    """Script of a translated text: 'hi' if it has Devanagari, else 'en'."""
+    return "hi" if text_out and _has_dev(text_out) else "en"
+
+def _translate_stream(requests: List[Tuple[str, str, str]], translator, max_workers: int = 5) -> Iterator[str]:
+    """
+    batch_translate_text(requests), yielded one result at a time in order. The translator
+    runs chunk by chunk on a background thread that starts right away, so the caller can
+    erase pages before consuming and draw the finished part while the next chunk is still
+    on the network.
+    """
+    if not translator or not requests:
+        return iter(batch_translate_text(requests, translator, max_workers=max_workers))
+    # bulk providers take batch_size texts per request, batch_concurrency requests at a time:
+    # hand them that much per call so chunking adds no round trips and keeps them all busy
+    if getattr(translator, "supports_batch", False):
+        chunk = getattr(translator, "batch_size", 100) * getattr(translator, "batch_concurrency", 1)
+    else:
+        chunk = 32
+
+    q: "queue.Queue[Any]" = queue.Queue(maxsize=4)
+    # set once the consumer is gone (exhausted, closed, or dropped after a failed draw), so the
+    # producer never blocks on a full queue holding the translator for the rest of the process
+    cancel = threading.Event()
+
+    def _put(item) -> bool:
+        while not cancel.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce():
+        try:
+            for i in range(0, len(requests), chunk):
+                if cancel.is_set() or not _put(batch_translate_text(requests[i:i + chunk], translator,
+                                                                    max_workers=max_workers)):
+                    return
+            _put(None)
+        except BaseException as e:
+            _put(e)
+
+    t = threading.Thread(target=_produce, name="translate", daemon=True)
+    t.start()
+
+    def _results():
+        try:
+            while True:
+                part = q.get()
+                if part is None:
+                    break
+                if isinstance(part, BaseException):
+                    raise part
+                yield from part
+        finally:
+            cancel.set()
+        t.join()
+
+    results = _results()
+    weakref.finalize(results, cancel.set)  # a generator dropped before its first next() skips its finally
+    return results
+
+class _OpSink:
+    """
+    Receives DrawOps as translations arrive. If the document is going to be drawn in-process
+    anyway, each op is laid out right away (overlapping the translation still in flight) into
+    its page's Shape, committed in finish(); otherwise ops are collected for draw_text_ops'
+    process pool.
+    """
+    def __init__(self, out: fitz.Document, busy_pages: int, num_workers: Optional[int]):
+        self.out = out
+        self.num_workers = num_workers
+        self.live = not _draws_in_pool(num_workers, busy_pages)
+        self.shapes: Dict[int, fitz.Shape] = {}
+        self.ops_by_page: Dict[int, List[DrawOp]] = {}
+
+    def add(self, pno: int, op: DrawOp) -> None:
+        if not self.live:
+            self.ops_by_page.setdefault(pno, []).append(op)
+            return
+        shape = self.shapes.get(pno)
+        if shape is None:
+            shape = self.shapes[pno] = self.out[pno].new_shape()
+        _draw_page_ops(shape.page, [op], shape)
+
+    def finish(self) -> fitz.Document:
+        """The document to save (see draw_text_ops)."""
+        if self.live:
+            for shape in self.shapes.values():
+                shape.commit(overlay=True)
+            return self.out
+        return draw_text_ops(self.out, self.ops_by_page, self.num_workers)
+
+def _draw_page_ops(page: fitz.Page, ops: List[DrawOp], shape: Optional[fitz.Shape] = None) -> None:
+    # One Shape per page: a single content-stream commit for all of its text instead of a
+    # Shape + /Contents stream + wrap_contents per insert_text call. Without `shape`, the
+    # page's own is committed here.
+    sh = page.new_shape() if shape is None else shape
+    for rect, text, fname, size, color, ffile in ops:
+        if not text or text.isspace():
+            continue  # nothing to show; skip the font-fitting loop
+        insert_text_fit(page, rect, text, fname, size, color, fontfile=ffile, shape=sh)
+    if shape is None:
+        sh.commit(overlay=True)
+
+def _draw_page_worker(page_pdf: bytes, ops: List[DrawOp]) -> bytes:
+    """Worker: draw one page's ops onto its single-page PDF and return the result."""
+    doc = fitz.open("pdf", page_pdf)
+    try:
+        _draw_page_ops(doc[0], ops)
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+def _draws_in_pool(num_workers: Optional[int], busy_pages: int) -> bool:
+    if num_workers is None:
+        num_workers = min(os.cpu_count() or 1, 4)
+    return num_workers > 1 and busy_pages >= _PARALLEL_MIN_PAGES
+
+def draw_text_ops(out: fitz.Document, ops_by_page: Dict[int, List[DrawOp]],
+                  num_workers: Optional[int] = 1) -> fitz.Document:
+    """
+    Draw translated text onto `out`. Text fitting (insert_textbox retries) is the CPU-heavy
+    part and pages are independent, so larger documents are split into single-page PDFs,
+    drawn in a process pool and stitched back together in page order.
+    Returns the document to save: `out` itself when drawn in-process, otherwise a new
+    document (and `out` is closed).
+    """
+    busy = [pno for pno, ops in ops_by_page.items() if ops]
+    if not _draws_in_pool(num_workers, len(busy)):
+        for pno in busy:
+            _draw_page_ops(out[pno], ops_by_page[pno])
+        return out
+    if num_workers is None:
+        num_workers = min(os.cpu_count() or 1, 4)
+
+    def _page_pdf(pno: int) -> bytes:
+        one = fitz.open()
+        one.insert_pdf(out, from_page=pno, to_page=pno)
+        try:
+            return one.tobytes()
+        finally:
+            one.close()
+
+    ex = _shared_pool(num_workers)
+    futs = {pno: ex.submit(_draw_page_worker, _page_pdf(pno), ops_by_page[pno]) for pno in busy}
+    merged = fitz.open()
+    for pno in range(len(out)):
+        if pno in futs:
+            part = fitz.open("pdf", futs.pop(pno).result())
+            merged.insert_pdf(part)
+            part.close()
+        else:
+            merged.insert_pdf(out, from_page=pno, to_page=pno)
+    out.close()
+    return merged
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+def render_overlay_pngs(jobs: List[tuple], num_workers: Optional[int] = 1) -> List[Optional[bytes]]:
+    """
+    overlay_render_text_png(*job) for every job, in order. Rasterizing and PNG-encoding at
+    high DPI dominates overlay-as-image runs and needs no PDF objects, so larger batches
+    are rendered in a process pool; the caller only inserts the finished images.
+    """
+    if num_workers is None:
+        num_workers = min(os.cpu_count() or 1, 4)
+    if num_workers <= 1 or len(jobs) < _PARALLEL_MIN_IMAGES:
+        return [overlay_render_text_png(*job) for job in jobs]
+    return list(_shared_pool(num_workers).map(overlay_render_text_png, *zip(*jobs),
+                                              chunksize=max(1, len(jobs) // (4 * num_workers))))
+
+def _save_drawn(drawn: fitz.Document, output_pdf: str,
+                save_executor: Optional[Executor] = None) -> Optional[Future]:
+    """
+    Save and close `drawn`. With `save_executor`, the PDF is serialized here (MuPDF is not
+    thread-safe) and only the file write is handed off; the pending write is returned.
+    """
+    os.makedirs(os.path.dirname(output_pdf) or ".", exist_ok=True)
+    # Compress every stream and drop objects orphaned by redaction/erasing.
+    # garbage=4 also compares streams, which merges duplicate fonts (pages drawn in
+    # separate processes each embed their own copy) and identical images back into one.
+    # Object streams pack the many small page/font/annotation dicts into compressed streams;
+    # clean rewrites the content streams left fragmented by redaction and insert_text.
+    opts = dict(garbage=4, deflate=True, deflate_images=True, deflate_fonts=True,
+                use_objstms=1, clean=True)
+    if save_executor is None:
+        drawn.save(output_pdf, **opts)
+        drawn.close()
+        return None
+    data = drawn.tobytes(**opts)
+    drawn.close()
+    return save_executor.submit(_write_bytes, output_pdf, data)
+
+def _store_translations(translator, translation_cache: Optional[str]) -> None:
+    if translation_cache and translator is not None:
+        try:
+            save_translation_cache(translator, translation_cache)
+        except OSError as e:
+            log.warning("[WARN] could not write translation cache %s: %s", translation_cache, e)
+
+def _fresh_src_out(source: "str | bytes") -> Tuple[fitz.Document, fitz.Document]:
+    """Open `source` (a path, or the file's bytes already in memory) with an empty output copy."""
+    s = fitz.open(stream=source, filetype="pdf") if isinstance(source, bytes) else fitz.open(source)
+    return s, _base_range(s, 0, len(s))
+
+def _run_submode(source: "str | bytes", kwargs: Dict[str, Any],
+                 translator=None, layout_analyzer=None) -> Optional[Future]:
+    """One sub-run of "all" mode on a fresh copy of `source` (also the process-pool entry point)."""
+    s, o = _fresh_src_out(source)
+    return run_mode(src=s, out=o, translator=translator, layout_analyzer=layout_analyzer, **kwargs)
 
 def run_mode(mode: str, src: fitz.Document, out: fitz.Document,
              orig_index: Dict[int, List[Dict[str, Any]]],
@@ -58,24 +315,31 @@ def run_mode(mode: str, src: fitz.Document, out: fitz.Document,
              output_pdf: str,
              # ----- overlay parameters -----
              overlay_items: Optional[List[Dict[str, Any]]] = None,
-             overlay_render: str = "image",     # "image" | "textbox"
-             overlay_align: int = 0,
-             overlay_line_spacing: float = 1.10,
-             overlay_margin_px: float = 0.1,
-             overlay_target_dpi: int = 600,
-             overlay_scale_x: float = 1.0, overlay_scale_y: float = 1.0,
-             overlay_off_x: float = 0.0, overlay_off_y: float = 0.0,
+             overlay: OverlayConfig = DEFAULT_OVERLAY,
              # ----- translator -----
              translator = None,
              # ----- layout -----
              use_ai_layout: bool = False,
              layout_analyzer = None,
              # ----- UX -----
-             progress_callback = None) -> None:
+             progress_callback = None,
+             # ----- parallelism -----
+             num_workers: Optional[int] = 1,
+             # ----- pre-extracted (spans, lines, blocks); "all" mode shares one extraction -----
+             text_units: Optional[Tuple[List[Span], List[Line], List[Block]]] = None,
+             # ----- background file write; the pending write is returned -----
+             save_executor: Optional[Executor] = None,
+             # ----- JSON file of finished translations, reused across runs -----
+             translation_cache: Optional[str] = None) -> Optional[Future]:
     """
-    - span/line/block/hybrid: style-preserving translation and draw.
+    - span/line/block/hybrid: style-preserving translation and draw. Drawing is spread over
+      `num_workers` processes for larger documents (default 1 = in-process; None = up to 4).
+      The pool spawns fresh interpreters, so a script passing num_workers != 1 needs an
+      `if __name__ == "__main__":` guard.
     - overlay: paint from prebuilt JSON items.
     - all: run span, line, block, hybrid, and (if provided) overlay; zip results.
+      With a translator the sub-runs run one after another in this process, sharing its
+      translation cache; without one they go to a process pool.
     """
 
 
@@ -87,6 +351,9 @@ def run_mode(mode: str, src: fitz.Document, out: fitz.Document,
         vn_regular_path=font_vn_file
     )
 
+    if translation_cache and translator is not None and mode != "all":
+        load_translation_cache(translator, translation_cache)
+
     # ======================= "ALL" MODE =======================
     if mode == "all":
         src_path = getattr(src, "name", None)
@@ -108,191 +375,210 @@ def run_mode(mode: str, src: fitz.Document, out: fitz.Document,
         def _make_output(label: str) -> str:
             return f"{base}.{label}{ext}"
 
-        def _fresh_src_out() -> Tuple[fitz.Document, fitz.Document]:
-            s = fitz.open(src_path)
-            o = fitz.open()
-            for p in range(len(s)):
-                po = o.new_page(width=s[p].rect.width, height=s[p].rect.height)
-                po.show_pdf_page(po.rect, s, p)
-            return s, o
-
+        # Read the file once: in-process sub-runs reopen it from memory. Pool workers still get
+        # the path, since reading it there (page cache) is cheaper than pickling the bytes over.
+        with open(src_path, "rb") as f:
+            src_bytes = f.read()
+
+        # Parse the text layer once for all sub-runs instead of once (or twice) per sub-run
+        # (from the path, so long documents can be split across worker processes)
+        with fitz.open(src_path) as d:
+            units = extract_all_from_textlayer(d, num_workers=num_workers)
+
+        common = dict(
+            text_units=units, translation_cache=translation_cache,
+            orig_index=orig_index, translate_dir=translate_dir,
+            erase_mode=erase_mode, redact_color=redact_color,
+            font_en_name=font_en_name, font_en_file=font_en_file,
+            font_hi_name=font_hi_name, font_hi_file=font_hi_file,
+            font_vn_name=font_vn_name, font_vn_file=font_vn_file,
+        )
+        jobs: List[Tuple[str, Dict[str, Any]]] = []
         for sub_mode in ("span", "line", "block", "hybrid"):
+            jobs.append((sub_mode, dict(
+                common, mode=sub_mode, output_pdf=_make_output(sub_mode),
+                use_ai_layout=use_ai_layout if sub_mode == "hybrid" else False,
+            )))
+        if overlay_items:
+            jobs.append(("overlay", dict(
+                common, mode="overlay", output_pdf=_make_output("overlay"),
+                overlay_items=overlay_items, overlay=overlay,
+            )))
+        else:
+            log.info("[info] overlay skipped in 'all' mode (no overlay_items provided).")
+
+        # With a translator the sub-runs stay here, one at a time: they then share its in-process
+        # translation cache, and remote services see no more concurrent clients than one run
+        # (Googletrans hangs on concurrency > 1). Without one they only share the input file and
+        # run side by side; hybrid with an already-loaded layout model stays here (no second model copy).
+        pool_size = min(num_workers if num_workers is not None else (os.cpu_count() or 1), len(jobs))
+        remote, local = [], []
+        for label, kw in jobs:
+            needs_model = kw.get("use_ai_layout") and layout_analyzer is not None
+            (remote if pool_size > 1 and translator is None and not needs_model else local).append((label, kw))
+
+        ok = set()
+        # In-process sub-runs write their PDF on a background thread while the next one builds
+        writer = ThreadPoolExecutor(max_workers=1)
+        writes: Dict[str, Future] = {}
+
+        def _run_local(label: str, kw: Dict[str, Any]) -> None:
             try:
-                s, o = _fresh_src_out()
-                run_mode(
-                    mode=sub_mode, src=s, out=o,
-                    orig_index=orig_index, translate_dir=translate_dir,
-                    erase_mode=erase_mode, redact_color=redact_color,
-                    font_en_name=font_en_name, font_en_file=font_en_file,
-                    font_hi_name=font_hi_name, font_hi_file=font_hi_file,
-                    font_vn_name=font_vn_name, font_vn_file=font_vn_file,
-                    output_pdf=_make_output(sub_mode),
-                    translator=translator,
-                    use_ai_layout=use_ai_layout if sub_mode == "hybrid" else False,
-                    layout_analyzer=layout_analyzer,
-                )
-                out_files.append((sub_mode, _make_output(sub_mode)))
+                fut = _run_submode(src_bytes, dict(kw, num_workers=num_workers, save_executor=writer),
+                                   translator=translator, layout_analyzer=layout_analyzer)
+                if fut is not None:
+                    writes[label] = fut
+                else:
+                    ok.add(label)
             except Exception as e:
-                print(f"[WARN] {sub_mode} failed: {e}")
+                log.warning("[WARN] %s failed: %s", label, e)
+
+        if remote:
+            ctx = multiprocessing.get_context("spawn")  # fork is unsafe with MuPDF on macOS
+            with ProcessPoolExecutor(max_workers=min(pool_size, len(remote)), mp_context=ctx) as ex:
+                # page drawing inside each worker stays in-process: the sub-runs are the parallelism
+                futs = {label: ex.submit(_run_submode, src_path, dict(kw, num_workers=1))
+                        for label, kw in remote}
+                for label, kw in local:
+                    _run_local(label, kw)
+                for label, fut in futs.items():
+                    try:
+                        fut.result()
+                        ok.add(label)
+                    except Exception as e:
+                        log.warning("[WARN] %s failed: %s", label, e)
+        else:
+            for label, kw in local:
+                _run_local(label, kw)
 
-        if overlay_items:
+        for label, fut in writes.items():
             try:
-                s, o = _fresh_src_out()
-                run_mode(
-                    mode="overlay", src=s, out=o,
-                    orig_index=orig_index, translate_dir=translate_dir,
-                    erase_mode=erase_mode, redact_color=redact_color,
-                    font_en_name=font_en_name, font_en_file=font_en_file,
-                    font_hi_name=font_hi_name, font_hi_file=font_hi_file,
-                    font_vn_name=font_vn_name, font_vn_file=font_vn_file,
-                    output_pdf=_make_output("overlay"),
-                    overlay_items=overlay_items, overlay_render=overlay_render,
-                    overlay_align=overlay_align, overlay_line_spacing=overlay_line_spacing,
-                    overlay_margin_px=overlay_margin_px, overlay_target_dpi=overlay_target_dpi,
-                    overlay_scale_x=overlay_scale_x, overlay_scale_y=overlay_scale_y,
-                    overlay_off_x=overlay_off_x, overlay_off_y=overlay_off_y,
-                    translator=translator,
-                )
-                out_files.append(("overlay", _make_output("overlay")))
+                fut.result()
+                ok.add(label)
             except Exception as e:
-                print(f"[WARN] overlay failed: {e}")
-        else:
-            print("[info] overlay skipped in 'all' mode (no overlay_items provided).")
+                log.warning("[WARN] %s failed: %s", label, e)
+        writer.shutdown()
+
+        out_files = [(label, _make_output(label)) for label, _ in jobs if label in ok]
 
         zip_path = f"{base}_all_methods.zip"
         os.makedirs(os.path.dirname(zip_path) or ".", exist_ok=True)
-        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        # The PDFs are already deflated; storing them skips a second, useless zlib pass
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zf:
             for label, path in out_files:
                 if os.path.exists(path):
                     arc = os.path.basename(path)
-                    zf.write(path, arcname=arc)
+                    # zf.write copies in 8 KiB blocks; MiB blocks cut the per-block CRC/write calls
+                    with open(path, "rb") as fsrc, zf.open(zipfile.ZipInfo.from_file(path, arc), "w") as fdst:
+                        shutil.copyfileobj(fsrc, fdst, 1 << 20)
                 else:
-                    print(f"[WARN] missing output for {label}: {path}")
+                    log.warning("[WARN] missing output for %s: %s", label, path)
 
-        print(f"[OK] Wrote {len(out_files)} PDFs and zipped -> {zip_path}")
+        log.info("[OK] Wrote %d PDFs and zipped -> %s", len(out_files), zip_path)
         return
 
     # --------- Shared: spans (for style/erase in non-overlay modes) ----------
-    spans = extract_spans_from_textlayer(src)
-    transfer_style_from_original(spans, orig_index)
+    if text_units is None:
+        text_units = extract_all_from_textlayer(src, lines=(mode == "line"), blocks=(mode == "block"),
+                                                num_workers=num_workers)
+    spans, lines, blocks = text_units
+    spans_by_page = group_by_page(spans)  # shared by style transfer, erase and derive_*_styles
+    transfer_style_from_original(spans, orig_index, spans_by_page=spans_by_page)
 
     # ======================= OVERLAY MODE =======================
     if mode == "overlay":
         if not overlay_items:
             raise ValueError("overlay mode requires overlay_items (use overlay_load_items on your JSON).")
 
-        if erase_mode in ("mask", "redact"):
-            spans_by_page: Dict[int, List[Span]] = {}
-            for sp in spans:
-                spans_by_page.setdefault(sp.page, []).append(sp)
+        # Items come in arbitrary page order; bind each Page wrapper once instead of per item
+        pages = list(out)
+        # Convert once for attribute access below; each item's rect (after the affine
+        # tweak) is shared by the erase and render passes
+        items = [it for it in map(OverlayItem.from_dict, overlay_items) if 0 <= it.page < len(pages)]
+        rects = [overlay_transform_rect(it.bbox, scale_x=overlay.scale_x, scale_y=overlay.scale_y,
+                                        off_x=overlay.off_x, off_y=overlay.off_y) for it in items]
 
-            redacted_pages = set()
-            for it in overlay_items:
-                pno = int(it["page"])
-                if pno < 0 or pno >= len(out):
-                    continue
-                page = out[pno]
-                r = overlay_transform_rect(
-                    it["bbox"], scale_x=overlay_scale_x, scale_y=overlay_scale_y,
-                    off_x=overlay_off_x, off_y=overlay_off_y
-                ) & page.rect
-                if r.is_empty:
-                    continue
+        if erase_mode in ("mask", "redact"):
+            span_index = SpanIndex(spans)
 
-                fill = dominant_text_fill_for_rect(pno, r, spans_by_page)
+            # pno -> item rects; clipped, filled and erased one page at a time
+            to_erase: Dict[int, list] = {}
+            for it, r in zip(items, rects):
+                to_erase.setdefault(it.page, []).append(tuple(r))
 
+            for pno, page_rects in to_erase.items():
+                page = pages[pno]
+                _, kept = _pad_clip_rects(page_rects, None, page.rect)
+                fills = dominant_text_fills_for_rects(pno, kept, span_index)
                 if erase_mode == "mask":
-                    page.draw_rect(r, color=None, fill=fill, overlay=True, width=0)
-                else:
-                    page.add_redact_annot(r, fill=fill)
-                    redacted_pages.add(pno)
-
-            if erase_mode == "redact":
-                for pno in redacted_pages:
+                    for r, fill in zip(kept, fills):
+                        page.draw_rect(r, color=None, fill=fill, overlay=True, width=0)
+                elif kept:
+                    for r, fill in _coalesce_rects(kept, fills):
+                        page.add_redact_annot(r, fill=fill)
                     try:
-                        out[pno].apply_redactions()
+                        page.apply_redactions()
                     except Exception as e:
-                        print(f"[page {pno}] apply_redactions error: {e}")
+                        log.warning("[page %d] apply_redactions error: %s", pno, e)
 
         # Prepare batch items
-        # overlay_items is List[Dict]
         # We need to translate 'text' if not already done.
         
         # 1. Collect translation requests
         # We'll store index to map back
         requests = [] 
         indices = []
+        # auto: en defaults to vi here (hi -> en, anything else -> hi -> en)
+        pick = direction_picker(translate_dir, auto_en_target="vi")
         
-        for i, it in enumerate(overlay_items):
-            pno = int(it["page"])
-            if pno < 0 or pno >= len(out): continue
-            
-            raw_text = it.get("text", "")
+        for i, it in enumerate(items):
+            raw_text = it.text
             if not raw_text: continue
             
             # FIX: OCR I vs |
             raw_text = re.sub(r'(^|\s)\|(?=\s)', r'\1I', raw_text)
             
             # Determine direction (overlay logic is simpler, usually en->hi or explicit)
-            # Default auto logic from build_overlay_items usually sets it?
-            # Let's assume global translate_dir logic or simple detect.
-            if translate_dir == "hi->en": s, d = "hi", "en"
-            elif translate_dir == "en->hi": s, d = "en", "hi"
-            elif translate_dir == "en->vi": s, d = "en", "vi"
-            else:
-                sl_detect = _dominant_script(raw_text)
-                if sl_detect == "hi": d = "en"
-                elif sl_detect == "en": d = "vi" # default to vi if auto and en detected? Or hi? Let's stick to safe defaults or expand logic.
-                else: d = "en"
-                s = sl_detect
-                if s not in ("hi", "en"): s, d = "hi", "en"
+            s, d = pick(raw_text)
             
             requests.append((raw_text, s, d))
             indices.append(i)
             
         # 2. Batch translate
-        print(f"[overlay] Batch translating {len(requests)} items...")
+        log.info("[overlay] Batch translating %d items...", len(requests))
         if progress_callback: progress_callback(f"Translating {len(requests)} text items (Overlay)...")
         
         # Googletrans hangs on concurrency > 1
         mw = 1 if (translator and translator.__class__.__name__ == "GoogleTranslator") else 5
         translated_texts = batch_translate_text(requests, translator, max_workers=mw)
         
-        # 3. Apply translations back to items (temporarily or permanently)
+        # 3. Apply translations back to items
         for idx, trans_text in zip(indices, translated_texts):
-             overlay_items[idx]["translated_text"] = trans_text
+             items[idx].translated_text = trans_text
 
         # 4. Render
         if progress_callback: progress_callback(f"Rendering {len(out)} pages (Overlay)...")
-        for it in overlay_items:
-            pno = int(it["page"])
-            if pno < 0 or pno >= len(out):
-                continue
-            page = out[pno]
-            rect = overlay_transform_rect(
-                it["bbox"], scale_x=overlay_scale_x, scale_y=overlay_scale_y,
-                off_x=overlay_off_x, off_y=overlay_off_y
-            )
+        images: List[Tuple[fitz.Page, fitz.Rect]] = []
+        image_jobs: List[tuple] = []
+        for it, rect in zip(items, rects):
             if rect.is_empty:
                 continue
+            page = pages[it.page]
             
             # Prefer translated text if we just made it, else existing
-            text = it.get("translated_text", "") or it.get("text", "")
-            base_fs = float(it.get("fontsize", 11.5))
+            text = it.translated_text or it.text
+            base_fs = it.fontsize
 
             fontfile = overlay_choose_fontfile_for_text(text, font_en_file, font_hi_file)
 
-            if overlay_render == "image":
-                overlay_draw_text_as_image(
-                    page, rect, text, base_fs, fontfile,
-                    target_dpi=overlay_target_dpi,
-                    line_spacing=overlay_line_spacing,
-                    align=overlay_align,
-                    margin_px=overlay_margin_px,
-                )
+            if overlay.render == "image":
+                if text:
+                    images.append((page, rect))
+                    image_jobs.append((rect.width, rect.height, text, base_fs, fontfile, overlay.target_dpi,
+                                       overlay.line_spacing, overlay.align, overlay.margin_px))
             else:
                 # Real text (keeps text layer). Choose fontname logically by script, but feed fontfile.
-                if _DEV.search(text or ""):
+                if _has_dev(text or ""):
                     fname, ffile = font_hi_name, font_hi_file
                 else:
                     fname, ffile = font_en_name, font_en_file
@@ -307,94 +593,45 @@ def run_mode(mode: str, src: fitz.Document, out: fitz.Document,
                     text, fname, base_fs, (0.0,), fontfile=ffile
                 )
 
+        # Images go in item order, as before, so overlapping items stack the same way
+        for (page, rect), stream in zip(images, render_overlay_pngs(image_jobs, num_workers)):
+            if stream is not None:
+                page.insert_image(rect, stream=stream, keep_proportion=False, overlay=True)
+
         # Save & close
+        _store_translations(translator, translation_cache)
         os.makedirs(os.path.dirname(output_pdf) or ".", exist_ok=True)
-        out.save(output_pdf); out.close(); src.close()
-        print(f"[OK] Wrote translated PDF to: {output_pdf}")
-        return
+        pending = _save_drawn(out, output_pdf, save_executor); src.close()
+        log.info("[OK] Wrote translated PDF to: %s", output_pdf)
+        return pending
 
     if mode == "hybrid":
         if use_ai_layout and layout_analyzer:
-            print("[hybrid] Using AI Layout Analysis...")
-            hblocks = extract_blocks_from_layout(src, layout_analyzer)
+            log.info("[hybrid] Using AI Layout Analysis...")
+            hblocks = extract_blocks_from_layout(src, layout_analyzer, num_workers=num_workers)
         else:
             hblocks = extract_blocks_with_segments(src)
             
-        derive_block_styles_from_spans(hblocks, spans)
-
-        # ---- ERASE: dynamic fill, supports both overlay_items and block fallback ----
-        if erase_mode in ("mask", "redact"):
-            spans_by_page: Dict[int, List[Span]] = {}
-            for sp in spans:
-                spans_by_page.setdefault(sp.page, []).append(sp)
-
-            redacted_pages = set()
-
-            def _erase_rect(pno: int, r: fitz.Rect, pad_pt: float):
-                page = out[pno]
-                rr = fitz.Rect(r.x0 - pad_pt, r.y0 - pad_pt, r.x1 + pad_pt, r.y1 + pad_pt) & page.rect
-                if rr.is_empty:
-                    return
-                fill = dominant_text_fill_for_rect(pno, rr, spans_by_page)
-                if erase_mode == "mask":
-                    page.draw_rect(rr, color=None, fill=fill, overlay=True, width=0)
-                else:
-                    page.add_redact_annot(rr, fill=fill)
-                    redacted_pages.add(pno)
-
-            if overlay_items:
-                for it in overlay_items:
-                    pno = int(it["page"])
-                    if not (0 <= pno < len(out)):
-                        continue
-                    rect = overlay_transform_rect(
-                        it["bbox"],
-                        scale_x=overlay_scale_x, scale_y=overlay_scale_y,
-                        off_x=overlay_off_x, off_y=overlay_off_y
-                    )
-                    base_fs = float(it.get("fontsize", 11.5))
-                    pad = max(1.0, 0.18 * base_fs)
-                    _erase_rect(pno, rect, pad)
-            else:
-                for bl in hblocks:
-                    pno = bl.page
-                    rect = fitz.Rect(*bl.rect)
-                    pad = max(1.0, 0.18 * (bl.fontsize or 11.5))
-                    _erase_rect(pno, rect, pad)
-
-            if erase_mode == "redact":
-                for pno in redacted_pages:
-                    try:
-                        out[pno].apply_redactions()
-                    except Exception as e:
-                        print(f"[page {pno}] apply_redactions error: {e}")
+        derive_block_styles_from_spans(hblocks, spans, spans_by_page)
 
         # 1. Collect requests (Hybrid is complex: segments inside lines vs block text)
         requests = []
         # Store metadata to map back: (block_idx, line_idx, seg_idx) or (block_idx, None, None)
         map_back = [] 
+        # Auto logic: keep "auto" as en<->hi for backward compat.
+        pick = direction_picker(translate_dir)
         
         for b_i, bl in enumerate(hblocks):
-            if translate_dir == "hi->en":
-                 sl_def, dl_def = "hi", "en"
-            elif translate_dir == "en->hi":
-                 sl_def, dl_def = "en", "hi"
-            elif translate_dir == "en->vi":
-                 sl_def, dl_def = "en", "vi"
-            else:
-                 sl_def = _dominant_script(bl.text)
-                 # Auto logic: if hi -> en. If en -> vi (if user wants vi). But "auto" is ambiguous.
-                 # Let's keep existing "auto" as en<->hi for backward compat unless we improve it.
-                 dl_def = "en" if sl_def == "hi" else "hi"
-                 if sl_def not in ("hi","en"): sl_def, dl_def = "hi", "en"
+            sl_def, dl_def = pick(bl.text)
             
             if is_table_like(bl):
-                 cols = build_columns(bl)
+                 # Each segment's cell column, for the whole block at once
+                 seg_cols = iter(best_columns(bl, build_columns(bl)))
                  # We need to translate segments
                  for l_i, ln in enumerate(bl.lines):
                      for s_i, seg in enumerate(ln.segments):
                          requests.append((seg.text, sl_def, dl_def))
-                         map_back.append({'type': 'seg', 'b': b_i, 'l': l_i, 's': s_i, 'cols': cols})
+                         map_back.append({'type': 'seg', 'b': b_i, 'l': l_i, 's': s_i, 'col': next(seg_cols)})
             else:
                  # Translate full block
                  # FIX: OCR often misreads 'I' as '|'. Clean specifically standalone '|'.
@@ -409,133 +646,126 @@ def run_mode(mode: str, src: fitz.Document, out: fitz.Document,
                  map_back.append({'type': 'block', 'b': b_i})
 
         # 2. Batch Translate
-        print(f"[hybrid] Batch translating {len(requests)} items...")
+        log.info("[hybrid] Batch translating %d items...", len(requests))
         if progress_callback: progress_callback(f"Translating {len(requests)} text blocks (hybrid mode)...")
         
         # Googletrans hangs on concurrency > 1
         mw = 1 if (translator and translator.__class__.__name__ == "GoogleTranslator") else 5
-        results = batch_translate_text(requests, translator, max_workers=mw)
+        # translation starts now on its own thread and runs while the originals are erased
+        translated = _translate_stream(requests, translator, max_workers=mw)
         
-        # 3. Render
-        print(f"[{mode}] Rendering {len(src)} pages...")
+        # ---- ERASE: dynamic fill, supports both overlay_items and block fallback ----
+        if erase_mode in ("mask", "redact"):
+            span_index = SpanIndex(spans)
+
+            redacted_pages = set()
+            # pno -> ([rect, ...], [fontsize, ...]); padded and clipped per page in one pass
+            to_erase: Dict[int, Tuple[list, list]] = {}
+
+            def _erase_rect(pno: int, r, fontsize: float):
+                rects, sizes = to_erase.setdefault(pno, ([], []))
+                rects.append(tuple(r)); sizes.append(fontsize)
+
+            if overlay_items:
+                for it in map(OverlayItem.from_dict, overlay_items):
+                    if not (0 <= it.page < len(out)):
+                        continue
+                    rect = overlay_transform_rect(
+                        it.bbox,
+                        scale_x=overlay.scale_x, scale_y=overlay.scale_y,
+                        off_x=overlay.off_x, off_y=overlay.off_y
+                    )
+                    _erase_rect(it.page, rect, it.fontsize)
+            else:
+                for bl in hblocks:
+                    _erase_rect(bl.page, bl.rect, bl.fontsize or 11.5)
+
+            for pno, (rects, sizes) in to_erase.items():
+                page = out[pno]
+                _, kept = _pad_clip_rects(rects, sizes, page.rect)
+                fills = dominant_text_fills_for_rects(pno, kept, span_index)
+                if erase_mode == "mask":
+                    for r, fill in zip(kept, fills):
+                        page.draw_rect(r, color=None, fill=fill, overlay=True, width=0)
+                else:
+                    for r, fill in _coalesce_rects(kept, fills):
+                        page.add_redact_annot(r, fill=fill)
+                    if kept:
+                        redacted_pages.add(pno)
+
+            if erase_mode == "redact":
+                for pno in redacted_pages:
+                    try:
+                        out[pno].apply_redactions()
+                    except Exception as e:
+                        log.warning("[page %d] apply_redactions error: %s", pno, e)
+
+        # 3. Render (pages are drawn while later chunks are still being translated)
+        log.info("[%s] Rendering %d pages...", mode, len(src))
         if progress_callback: progress_callback(f"Rendering {len(src)} pages ({mode} mode)...")
         
         # We need to map translations back.
         # requests order: loop over blocks (which are per page usually? No, hblocks is flat list?):
         # We iterate map_back and results together
-        for info, res_text in zip(map_back, results):
+        sink = _OpSink(out, len({bl.page for bl in hblocks}), num_workers)
+        match_font = matcher.match_font
+        for res_text, info in zip(translated, map_back):
             text_out = res_text or ""
+            tgt = _target_script(text_out)
             bl = hblocks[info['b']]
-            page = out[bl.page]
             
             if info['type'] == 'seg':
                  ln = bl.lines[info['l']]
                  seg = ln.segments[info['s']]
-                 cols = info['cols']
+                 best_col = info['col']
                  y0, y1 = ln.rect[1], ln.rect[3]
                  
                  # Font matching
-                 if text_out and _DEV.search(text_out): tgt = "hi"
-                 else: tgt = "en"
-                 fname, ffile = matcher.match_font(tgt, ln.flags, ln.font)
+                 fname, ffile = match_font(tgt, ln.flags, ln.font)
 
-                 try: base_size = statistics.median(seg.sizes)
-                 except: base_size = bl.fontsize
+                 base_size = _median(seg.sizes) if seg.sizes else bl.fontsize
                  
-                 best_col = max(cols, key=lambda c: max(0.0, min(seg.rect[2], c[1]) - max(seg.rect[0], c[0])))
                  cell_rect = (best_col[0], y0, best_col[1], y1)
-                 insert_text_fit(page, cell_rect, text_out, fname, base_size, bl.color, fontfile=ffile)
+                 sink.add(bl.page, (cell_rect, text_out, fname, base_size, bl.color, ffile))
             else:
                  # block
-                 if text_out and _DEV.search(text_out): tgt = "hi"
-                 else: tgt = "en"
-                 fname, ffile = matcher.match_font(tgt, bl.flags, bl.font)
-                 insert_text_fit(page, bl.rect, text_out, fname, bl.fontsize, bl.color, fontfile=ffile)
+                 fname, ffile = match_font(tgt, bl.flags, bl.font)
+                 sink.add(bl.page, (bl.rect, text_out, fname, bl.fontsize, bl.color, ffile))
 
-        os.makedirs(os.path.dirname(output_pdf) or ".", exist_ok=True)
-        out.save(output_pdf); out.close(); src.close()
-        print(f"[OK] Wrote translated PDF to: {output_pdf}")
-        return
+        _store_translations(translator, translation_cache)
+        pending = _save_drawn(sink.finish(), output_pdf, save_executor); src.close()
+        log.info("[OK] Wrote translated PDF to: %s", output_pdf)
+        return pending
 
-    erase_original_text(out, spans, mode, erase_mode, redact_color)
+    if mode == "line":
+        derive_line_styles_from_spans(lines, spans, spans_by_page)
+    elif mode == "block":
+        derive_block_styles_from_spans(blocks, spans, spans_by_page)
+    elif mode != "span":
+        raise ValueError(f"Unknown mode: {mode}")
+    units = {"span": spans, "line": lines, "block": blocks}[mode]
 
-    if mode == "span":
-        requests = []
-        for sp in spans:
-            if translate_dir == "hi->en": sl, dl = "hi","en"
-            elif translate_dir == "en->hi": sl, dl = "en","hi"
-            elif translate_dir == "en->vi": sl, dl = "en","vi"
-            else:
-                sl = _dominant_script(sp.text); dl = "en" if sl=="hi" else "hi"
-                if sl not in ("hi","en"): sl, dl = "hi","en"
-            requests.append((sp.text, sl, dl))
-            
-        print(f"[span] Batch translating {len(requests)} items...")
-        results = batch_translate_text(requests, translator)
-        
-        for sp, text_out in zip(spans, results):
-            page = out[sp.page]
-            if text_out and _DEV.search(text_out): tgt_script = "hi"
-            else:                                   tgt_script = "en"
-            fname, ffile = matcher.match_font(tgt_script, sp.flags, sp.font)
-            insert_text_fit(page, sp.rect, text_out, fname, sp.fontsize, sp.color, fontfile=ffile)
-
-    elif mode == "line":
-        lines = extract_lines_from_textlayer(src)
-        derive_line_styles_from_spans(lines, spans)
-        
-        requests = []
-        for ln in lines:
-            if translate_dir == "hi->en": sl, dl = "hi","en"
-            elif translate_dir == "en->hi": sl, dl = "en","hi"
-            elif translate_dir == "en->vi": sl, dl = "en","vi"
-            else:
-                sl = _dominant_script(ln.text); dl = "en" if sl=="hi" else "hi"
-                if sl not in ("hi","en"): sl, dl = "hi","en"
-            requests.append((ln.text, sl, dl))
-            
-        print(f"[line] Batch translating {len(requests)} items...")
-        results = batch_translate_text(requests, translator)
-
-        for ln, text_out in zip(lines, results):
-            page = out[ln.page]
-            if text_out and _DEV.search(text_out): tgt_script = "hi"
-            else:                                   tgt_script = "en"
-            fname, ffile = matcher.match_font(tgt_script, ln.flags, ln.font)
-            base_size = ln.fontsize if ln.fontsize else 11.5
-            color     = ln.color if ln.color else (0.0,)
-            insert_text_fit(page, ln.rect, text_out, fname, base_size, color, fontfile=ffile)
+    requests = direction_requests([u.text for u in units], translate_dir)
+    log.info("[%s] Batch translating %d items...", mode, len(requests))
+    # translation starts now on its own thread and runs while the originals are erased
+    translated = _translate_stream(requests, translator)
 
-    elif mode == "block":
-        blocks = extract_blocks_from_textlayer(src)
-        derive_block_styles_from_spans(blocks, spans)
-        
-        requests = []
-        for bl in blocks:
-            if translate_dir == "hi->en": sl, dl = "hi","en"
-            elif translate_dir == "en->hi": sl, dl = "en","hi"
-            elif translate_dir == "en->vi": sl, dl = "en","vi"
-            else:
-                sl = _dominant_script(bl.text); dl = "en" if sl=="hi" else "hi"
-                if sl not in ("hi","en"): sl, dl = "hi","en"
-            requests.append((bl.text, sl, dl))
-
-        print(f"[block] Batch translating {len(requests)} items...")
-        results = batch_translate_text(requests, translator)
-
-        for bl, text_out in zip(blocks, results):
-            page = out[bl.page]
-            if text_out and _DEV.search(text_out): tgt_script = "hi"
-            else:                                   tgt_script = "en"
-            fname, ffile = matcher.match_font(tgt_script, bl.flags, bl.font)
-            
-            base_size = bl.fontsize if bl.fontsize else 11.5
-            color     = bl.color if bl.color else (0.0,)
-            insert_text_fit(page, bl.rect, text_out, fname, base_size, color, fontfile=ffile)
+    erase_original_text(out, spans, mode, erase_mode, redact_color, spans_by_page)
+    match_font = matcher.match_font
+    sink = _OpSink(out, len({u.page for u in units}), num_workers)
 
+    if mode == "span":
+        for text_out, sp in zip(translated, spans):
+            fname, ffile = match_font(_target_script(text_out), sp.flags, sp.font)
+            sink.add(sp.page, (sp.rect, text_out, fname, sp.fontsize, sp.color, ffile))
     else:
-        raise ValueError(f"Unknown mode: {mode}")
-
-    os.makedirs(os.path.dirname(output_pdf) or ".", exist_ok=True)
-    out.save(output_pdf); out.close(); src.close()
-    print(f"[OK] Wrote translated PDF to: {output_pdf}")
\ No newline at end of file
+        for text_out, u in zip(translated, units):
+            fname, ffile = match_font(_target_script(text_out), u.flags, u.font)
+            base_size = u.fontsize if u.fontsize else 11.5
+            color     = u.color if u.color else (0.0,)
+            sink.add(u.page, (u.rect, text_out, fname, base_size, color, ffile))
+
+    _store_translations(translator, translation_cache)
+    pending = _save_drawn(sink.finish(), output_pdf, save_executor); src.close()
+    log.info("[OK] Wrote translated PDF to: %s", output_pdf)
+    return pending
\ No newline at end of file
@@ -1,89 +1,225 @@
-from typing import Tuple, List, Dict, Any
-import statistics, asyncio, nest_asyncio, fitz, re
+from typing import Tuple, List, Dict, Any, Optional
+from collections import Counter, OrderedDict
+import fitz, re, weakref, json, os, logging, tempfile, threading
 from concurrent.futures import ThreadPoolExecutor
 
-nest_asyncio.apply()
-
-from .utils import normalize_color, Span, Line, Block, rect_iou, rect_center, point_in_rect, center_dist
-from .utils import normalize_color, Span, Line, Block, rect_iou, rect_center, point_in_rect, center_dist
+from .utils import normalize_color, Span, Line, Block, already_in_target, _median, rect_matches, _shared_pool, group_by_page
 # from .constants import _TR # REMOVED
 
+log = logging.getLogger(__name__)
+
+_SPACE_BEFORE_PUNCT = re.compile(r"\s+([,.;:!?\u0964])")
+
+def _clean_translation(out: str) -> str:
+    # normalize whitespace and avoid spaces before punctuation/danda
+    out = "\n".join(" ".join(line.split()) for line in out.splitlines())
+    return _SPACE_BEFORE_PUNCT.sub(r"\1", out)
+
 def translate_text(text: str, src: str, dest: str, translator=None) -> str:
     """
     Translates text. 
     If translator is None, returns original text (or raises error if we prefer).
     """
-    if not translator:
+    if not translator or not text or text.isspace() or already_in_target(text, src, dest):
         return text
         
     try:
         out = translator.translate(text, source_lang=src, target_lang=dest)
-        # normalize whitespace and avoid spaces before punctuation/danda
-        out = "\n".join(" ".join(line.split()) for line in out.splitlines())
-        out = re.sub(r"\s+([,.;:!?\u0964])", r"\1", out)
-        return out
+        return _clean_translation(out)
     except Exception as e:
-        print(f"[translate] {type(e).__name__}: {e}"); return text
+        log.warning("[translate] %s: %s", type(e).__name__, e); return text
 
     except Exception as e:
-        print(f"[translate] {type(e).__name__}: {e}"); return text
+        log.warning("[translate] %s: %s", type(e).__name__, e); return text
+
+# Per-translator LRU of finished translations, keyed by (whitespace-normalized text, src, dest).
+# Module-level so the span/line/block/hybrid runs of "all" mode (in-process whenever there is a
+# translator) reuse each other's work; weak keys so a discarded translator takes its cache with it.
+# Translators are shared across threads (background translation, Streamlit sessions), so every
+# lookup, insert and eviction holds the cache's own lock.
+_TR_CACHE_MAX = 8192
+_TR_CACHE: "weakref.WeakKeyDictionary[Any, _TranslationLRU]" = weakref.WeakKeyDictionary()
+_TR_CACHE_LOCK = threading.Lock()
+
+class _TranslationLRU(OrderedDict):
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+
+def _translation_cache(translator) -> Optional[_TranslationLRU]:
+    try:
+        with _TR_CACHE_LOCK:
+            return _TR_CACHE.setdefault(translator, _TranslationLRU())
+    except TypeError:  # not weak-referenceable: just skip caching
+        return None
+
+def load_translation_cache(translator, path: str) -> int:
+    """
+    Seed `translator`'s in-memory cache from a JSON file written by save_translation_cache,
+    so a rerun on the same document skips the translator for everything it already did.
+    Use one file per provider/model. Returns the number of entries loaded.
+    """
+    cache = _translation_cache(translator)
+    if cache is None or not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        entries = {(txt, s, d): out for txt, s, d, out in rows[-_TR_CACHE_MAX:]}
+    except (OSError, ValueError, TypeError, KeyError) as e:  # unreadable, or JSON of another shape
+        log.warning("[translate] ignoring unreadable cache %s: %s", path, e)
+        return 0
+    with cache.lock:
+        cache.update(entries)
+        while len(cache) > _TR_CACHE_MAX:
+            cache.popitem(last=False)
+    return len(entries)
+
+def save_translation_cache(translator, path: str) -> int:
+    """
+    Merge `translator`'s in-memory cache into the JSON file at `path` (atomic replace),
+    keeping the newest _TR_CACHE_MAX entries (all load_translation_cache reads back).
+    Concurrent writers don't corrupt the file; the last one wins on overlapping entries.
+    The file is left alone when the cache adds nothing to it. Returns the number of entries in the file.
+    """
+    cache = _translation_cache(translator)
+    if cache is None:
+        return 0
+    with cache.lock:
+        cached = list(cache.items())  # LRU order, oldest first
+    if not cached:
+        return 0
+    merged: Dict[Tuple[str, str, str], str] = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                merged = {(t, s, d): o for t, s, d, o in json.load(f)}
+        except (OSError, ValueError, TypeError, KeyError):
+            merged = {}
+    if all(merged.get(k) == v for k, v in cached):
+        return len(merged)
+    for k, v in cached:  # reinsert so the file ends with the newest
+        merged.pop(k, None)
+        merged[k] = v
+    if len(merged) > _TR_CACHE_MAX:
+        merged = dict(list(merged.items())[-_TR_CACHE_MAX:])
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # a unique temp file per writer: threads (Streamlit sessions) share the pid
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump([[t, s, d, o] for (t, s, d), o in merged.items()], f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(merged)
 
 def batch_translate_text(items: List[Tuple[str, str, str]], translator, max_workers: int = 5) -> List[str]:
     """
     Translates a list of (text, src, dest) tuples in parallel.
     Returns a list of translated strings in the same order.
+    Repeated strings (headers, footers, table cells...) are sent to the translator once,
+    and results are remembered across calls with the same translator.
+    Empty / whitespace-only texts, and texts translation cannot change (already_in_target),
+    are returned as-is without a translator call.
     """
     if not items:
         return []
     if not translator:
         return [it[0] for it in items]
 
-    # Special optimized path for GoogleTranslator (supports bulk)
-    if translator.__class__.__name__ == "GoogleTranslator":
+    cache = _translation_cache(translator)
+    if cache is None:
+        cache = _TranslationLRU()
+    results: List[Optional[str]] = [None] * len(items)
+    pending: Dict[Tuple[str, str, str], List[int]] = {}
+    with cache.lock:
+        for i, (txt, s, d) in enumerate(items):
+            key = (" ".join(txt.split()), s, d)
+            if not key[0] or already_in_target(key[0], s, d):
+                results[i] = txt
+                continue
+            hit = cache.get(key)
+            if hit is not None:
+                cache.move_to_end(key)
+                results[i] = hit
+            else:
+                pending.setdefault(key, []).append(i)
+
+    if pending:
+        todo = [(items[idxs[0]][0], key[1], key[2]) for key, idxs in pending.items()]
+        done = _batch_translate_uncached(todo, translator, max_workers)
+        with cache.lock:
+            for (key, idxs), (txt, _, _), out in zip(pending.items(), todo, done):
+                for i in idxs:
+                    results[i] = out
+                # failures come back as the source text; don't pin those for later calls
+                if out and out != txt:
+                    cache[key] = out
+                    if len(cache) > _TR_CACHE_MAX:
+                        cache.popitem(last=False)
+    return results
+
+def _pack_batches(items: List[Tuple[int, str]], max_texts: int, max_chars: Optional[int]):
+    """
+    Consecutive runs of (idx, text) with at most max_texts entries and, when max_chars is set,
+    at most max_chars characters of text (a longer single text still goes alone).
+    """
+    part: List[Tuple[int, str]] = []; size = 0
+    for it in items:
+        n = len(it[1])
+        if part and (len(part) >= max_texts or (max_chars and size + n > max_chars)):
+            yield part
+            part = []; size = 0
+        part.append(it); size += n
+    if part:
+        yield part
+
+def _batch_translate_uncached(items: List[Tuple[str, str, str]], translator, max_workers: int = 5) -> List[str]:
+
+    # Bulk path for providers that take a list per request (Google, DeepL, OpenAI):
+    # one round trip per (src, dest) chunk instead of one per text
+    if getattr(translator, "supports_batch", False):
         # Group by (src, dest)
         from collections import defaultdict
         groups = defaultdict(list)
-        # Store original indices to restore order
-        original_indices = list(range(len(items)))
-        
         for idx, (txt, s, d) in enumerate(items):
             groups[(s, d)].append((idx, txt))
-        
-        final_results = [""] * len(items)
-        
+
+        # Chunk to the provider's batch size (100 for Google/DeepL) and character budget
+        chunk_size = getattr(translator, "batch_size", 100)
+        chunk_chars = getattr(translator, "batch_chars", None)
+        jobs = []  # (indices, texts, src, dest) per request
         for (s, d), group_items in groups.items():
-            indices = [x[0] for x in group_items]
-            texts = [x[1] for x in group_items]
-            
-            # Translate in bulk
+            for part in _pack_batches(group_items, chunk_size, chunk_chars):
+                jobs.append(([x[0] for x in part], [x[1] for x in part], s, d))
+
+        def _bulk(job) -> List[str]:
+            _, texts, s, d = job
             try:
-                # If list is too big, maybe chunk it? 
-                # googletrans usually handles reasonable sizes. Let's chunk by 100 just in case.
-                chunk_size = 100
-                translated_chunk_results = []
-                for i in range(0, len(texts), chunk_size):
-                    chunk = texts[i:i+chunk_size]
-                    res = translator.translate(chunk, source_lang=s, target_lang=d)
-                    if isinstance(res, list):
-                        translated_chunk_results.extend(res)
-                    elif isinstance(res, str):
-                        # Should return list if input is list, but just in case
-                        translated_chunk_results.append(res)
-                    else:
-                         # Fallback
-                         translated_chunk_results.extend(chunk)
-                
-                # Assign back
-                for idx, trans_txt in zip(indices, translated_chunk_results):
-                     # Safety check
-                     if idx < len(final_results):
-                        final_results[idx] = trans_txt
+                res = translator.translate_batch(texts, s, d)
             except Exception as e:
-                print(f"[batch_translate] Google bulk error: {e}")
-                # Fallback to original
-                for idx, txt in zip(indices, texts):
-                    final_results[idx] = txt
-                    
+                log.warning("[batch_translate] bulk error: %s", e)
+                return texts  # fallback to original
+            if isinstance(res, str) and len(texts) == 1:
+                res = [res]
+            if not isinstance(res, list) or len(res) != len(texts):
+                return texts
+            return [_clean_translation(r) if r else r for r in res]
+
+        # Requests are independent; providers that allow it get several in flight at once
+        workers = min(getattr(translator, "batch_concurrency", 1), len(jobs))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                outs = list(executor.map(_bulk, jobs))
+        else:
+            outs = [_bulk(job) for job in jobs]
+
+        final_results = [""] * len(items)
+        for (indices, _, _, _), out in zip(jobs, outs):
+            for idx, trans_txt in zip(indices, out):
+                final_results[idx] = trans_txt
         return final_results
 
     def _worker(args):
@@ -118,32 +254,64 @@ def extract_original_page_objects(input_pdf: str) -> Dict[int, List[Dict[str, An
 def transfer_style_from_original(spans: List[Span],
                                       orig_index: Dict[int, List[Dict[str, Any]]],
                                       iou_hi: float = 0.80,
-                                      iou_lo: float = 0.10) -> None:
-    for sp in spans:
-        candidates = orig_index.get(sp.page, [])
+                                      iou_lo: float = 0.10,
+                                      spans_by_page: Optional[Dict[int, List[Span]]] = None) -> None:
+    """
+    Copy color/size/font/flags onto each span from the original object that matches it best:
+    IoU >= iou_hi, else the smallest one containing its center, else IoU >= iou_lo, else the
+    nearest center. Scored per page as (spans x candidates) NumPy broadcasts; spans go in y
+    order, and each group is only tested against the candidates in its vertical band.
+    Pass spans_by_page (group_by_page(spans)) to reuse a grouping the caller already has.
+    """
+    import numpy as np
+    by_page = spans_by_page if spans_by_page is not None else group_by_page(spans)
+    chunk = 256  # spans per broadcast: bounds the temporaries on very dense pages
+    for pno, page_spans in by_page.items():
+        candidates = orig_index.get(pno, [])
         if not candidates: continue
-        best_iou = -1.0; best = None
-        for cand in candidates:
-            iou = rect_iou(sp.rect, cand["bbox"])
-            if iou > best_iou: best_iou = iou; best = cand
-        if best and best_iou >= iou_hi:
-            sp.color = best["color"]; sp.fontsize = best["size"]
-            sp.font = best["font"]; sp.flags = best["flags"]
-            continue
-        cx, cy = rect_center(sp.rect)
-        inside = [c for c in candidates if point_in_rect((cx,cy), c["bbox"])]
-        if inside:
-            spec = min(inside, key=lambda c: (c["bbox"][2]-c["bbox"][0])*(c["bbox"][3]-c["bbox"][1]))
-            sp.color = spec["color"]; sp.fontsize = spec["size"]
-            sp.font = spec["font"]; sp.flags = spec["flags"]
-            continue
-        if best and best_iou >= iou_lo:
-            sp.color = best["color"]; sp.fontsize = best["size"]
-            sp.font = best["font"]; sp.flags = best["flags"]
-            continue
-        nearest = min(candidates, key=lambda c: center_dist(sp.rect, c["bbox"]))
-        sp.color = nearest["color"]; sp.fontsize = nearest["size"]
-        sp.font = nearest["font"]; sp.flags = nearest["flags"]
+        c_all = np.array([cand["bbox"] for cand in candidates], dtype=np.float64).reshape(-1, 4)
+        by_y0 = np.argsort(c_all[:, 1], kind="stable")
+        c_y0 = c_all[by_y0, 1]
+        max_h = float(np.max(c_all[:, 3] - c_all[:, 1]))
+        c_area_all = (c_all[:, 2] - c_all[:, 0]) * (c_all[:, 3] - c_all[:, 1])
+        page_spans = sorted(page_spans, key=lambda sp: sp.rect[1])
+        for k in range(0, len(page_spans), chunk):
+            group = page_spans[k:k + chunk]
+            r = np.array([sp.rect for sp in group], dtype=np.float64).reshape(-1, 4)
+            x0, y0, x1, y1 = (r[:, j:j + 1] for j in range(4))
+            # Only candidates reaching the group's y-range can overlap a span or hold its center.
+            # Columns stay in original order so argmax/argmin break ties like the full scan.
+            lo = int(np.searchsorted(c_y0, float(r[:, 1].min()) - max_h, "left"))
+            hi = int(np.searchsorted(c_y0, float(r[:, 3].max()), "right"))
+            band = np.sort(by_y0[lo:hi])
+            c, c_area = c_all[band], c_area_all[band]
+            w = np.maximum(0.0, np.minimum(x1, c[:, 2]) - np.maximum(x0, c[:, 0]))
+            h = np.maximum(0.0, np.minimum(y1, c[:, 3]) - np.maximum(y0, c[:, 1]))
+            inter = w * h
+            union = np.maximum(1e-9, (x1 - x0) * (y1 - y0) + c_area - inter)
+            iou = np.where(inter > 0, inter / union, 0.0)
+            if len(band):
+                best = iou.argmax(axis=1)
+                best_iou = iou[np.arange(len(group)), best]
+                best = np.where(best_iou > 0, band[best], 0)  # no overlap: the full scan keeps the first
+            else:
+                best = np.zeros(len(group), dtype=np.int64); best_iou = np.zeros(len(group))
+            cx = (x0 + x1) / 2.0; cy = (y0 + y1) / 2.0
+            inside = (c[:, 0] <= cx) & (cx <= c[:, 2]) & (c[:, 1] <= cy) & (cy <= c[:, 3])
+            any_inside = inside.any(axis=1)
+            smallest = band[np.where(inside, c_area, np.inf).argmin(axis=1)] if len(band) else best
+            pick = np.where(best_iou >= iou_hi, best,
+                   np.where(any_inside, smallest, best))
+            # Nothing close enough: nearest center over all of the page's candidates
+            far = np.flatnonzero((best_iou < iou_hi) & ~any_inside & (best_iou < iou_lo))
+            if len(far):
+                fcx, fcy = cx[far], cy[far]
+                d = (fcx - (c_all[:, 0] + c_all[:, 2]) / 2.0) ** 2 + (fcy - (c_all[:, 1] + c_all[:, 3]) / 2.0) ** 2
+                pick[far] = d.argmin(axis=1)
+            for sp, i in zip(group, pick.tolist()):
+                cand = candidates[i]
+                sp.color = cand["color"]; sp.fontsize = cand["size"]
+                sp.font = cand["font"]; sp.flags = cand["flags"]
 
 def _rawdict(page: fitz.Page):
     try:
@@ -152,175 +320,156 @@ def _rawdict(page: fitz.Page):
     except Exception:
         return page.get_text("rawdict")
 
+def _chars_text_bbox(chars: List[Dict[str, Any]]) -> Tuple[str, Optional[Tuple[float, float, float, float]]]:
+    """Stripped text and union bbox (None when no char has one) of a rawdict span's chars, in one pass each."""
+    t = "".join([c.get("c", "") for c in chars]).strip()
+    cb = [c["bbox"] for c in chars if "bbox" in c]
+    if not cb:
+        return t, None
+    x0s, y0s, x1s, y1s = zip(*cb)
+    return t, (min(x0s), min(y0s), max(x1s), max(y1s))
+
 def extract_spans_from_textlayer(doc: fitz.Document) -> List[Span]:
-    spans: List[Span] = []
-    for pno in range(len(doc)):
-        raw = _rawdict(doc[pno])
-        for b in raw.get("blocks", []):
-            if "lines" not in b: continue
-            block_bbox = tuple(b.get("bbox", (0,0,0,0)))
-            for ln in b.get("lines", []):
-                for sp in ln.get("spans", []):
-                    # text
-                    if isinstance(sp.get("text"), str) and sp["text"].strip():
-                        t = " ".join(sp["text"].split())
-                    else:
-                        chars = sp.get("chars") or []
-                        t = "".join(ch.get("c","") for ch in chars).strip()
-                    if not t: continue
-                    # bbox
-                    if sp.get("bbox"): bb = tuple(map(float, sp["bbox"]))
-                    else:
-                        chars = sp.get("chars") or []
-                        if chars:
-                            xs0=[c["bbox"][0] for c in chars if "bbox" in c]
-                            ys0=[c["bbox"][1] for c in chars if "bbox" in c]
-                            xs1=[c["bbox"][2] for c in chars if "bbox" in c]
-                            ys1=[c["bbox"][3] for c in chars if "bbox" in c]
-                            bb = (min(xs0),min(ys0),max(xs1),max(ys1)) if xs0 else tuple(map(float, block_bbox))
-                        else:
-                            bb = tuple(map(float, block_bbox))
-                    size = float(sp.get("size", 11.5))
-                    color = normalize_color(sp.get("color", (0,0,0)))
-                    font_name = sp.get("font", "helv")
-                    flags = int(sp.get("flags", 0))
-                    spans.append(Span(pno, (bb[0],bb[1],bb[2],bb[3]), t, size, color, font_name, flags))
-    return spans
+    return extract_all_from_textlayer(doc, lines=False, blocks=False)[0]
 
 def extract_lines_from_textlayer(doc: fitz.Document) -> List[Line]:
-    lines: List[Line] = []
-    for pno in range(len(doc)):
+    return extract_all_from_textlayer(doc, blocks=False)[1]
+
+def extract_blocks_from_textlayer(doc: fitz.Document) -> List[Block]:
+    return extract_all_from_textlayer(doc, lines=False)[2]
+
+# Text-layer extraction is split across worker processes from this many pages up.
+_PARALLEL_MIN_EXTRACT_PAGES = 32
+
+def extract_all_from_textlayer(doc: fitz.Document, lines: bool = True, blocks: bool = True,
+                               num_workers: Optional[int] = 1) -> Tuple[List[Span], List[Line], List[Block]]:
+    """
+    Spans, lines and blocks from one walk over each page's text tree; same results as the
+    extract_*_from_textlayer functions. Pass lines/blocks=False to skip (and get []) a view.
+    With num_workers > 1 (None: up to 4) and a document opened from a file, long documents
+    are extracted in page ranges on the shared process pool and concatenated in page order.
+    """
+    if num_workers is None:
+        num_workers = min(os.cpu_count() or 1, 4)
+    n = len(doc)
+    if num_workers > 1 and n >= _PARALLEL_MIN_EXTRACT_PAGES and doc.name and os.path.isfile(doc.name):
+        step = -(-n // (4 * num_workers))  # a few ranges per worker evens out uneven pages
+        futs = [_shared_pool(num_workers).submit(_extract_range_worker, doc.name, p, min(p + step, n), lines, blocks)
+                for p in range(0, n, step)]
+        out_spans: List[Span] = []; out_lines: List[Line] = []; out_blocks: List[Block] = []
+        for fut in futs:
+            s_, l_, b_ = fut.result()
+            out_spans += s_; out_lines += l_; out_blocks += b_
+        return out_spans, out_lines, out_blocks
+    return _extract_range(doc, range(n), lines, blocks)
+
+def _extract_range_worker(path: str, start: int, stop: int, lines: bool, blocks: bool
+                          ) -> Tuple[List[Span], List[Line], List[Block]]:
+    """Worker: extract_all_from_textlayer for pages [start, stop) of the file at `path`."""
+    with fitz.open(path) as doc:
+        return _extract_range(doc, range(start, stop), lines, blocks)
+
+def _extract_range(doc: fitz.Document, pnos, lines: bool, blocks: bool
+                   ) -> Tuple[List[Span], List[Line], List[Block]]:
+    out_spans: List[Span] = []; out_lines: List[Line] = []; out_blocks: List[Block] = []
+    for pno in pnos:
         raw = _rawdict(doc[pno])
         for b in raw.get("blocks", []):
             if "lines" not in b: continue
             block_bbox = tuple(b.get("bbox", (0,0,0,0)))
+            block_rects: List[Tuple[float,float,float,float]] = []
+            block_text_lines: List[str] = []; block_sizes: List[float] = []
             for ln in b.get("lines", []):
                 spans = ln.get("spans", [])
-                if not spans: continue
                 txts, rects, sizes = [], [], []
                 for sp in spans:
                     if isinstance(sp.get("text"), str) and sp["text"].strip():
-                        t = " ".join(sp["text"].split()); bb = tuple(map(float, sp.get("bbox", block_bbox)))
+                        t = " ".join(sp["text"].split()); cbb = None
+                        # line/block geometry
+                        bb = tuple(map(float, sp.get("bbox", block_bbox))); blk_bb = bb
                     else:
-                        chars = sp.get("chars") or []
-                        t = "".join(ch.get("c","") for ch in chars).strip()
-                        if chars:
-                            xs0=[c["bbox"][0] for c in chars if "bbox" in c]
-                            ys0=[c["bbox"][1] for c in chars if "bbox" in c]
-                            xs1=[c["bbox"][2] for c in chars if "bbox" in c]
-                            ys1=[c["bbox"][3] for c in chars if "bbox" in c]
-                            bb = (min(xs0),min(ys0),max(xs1),max(ys1)) if xs0 else tuple(map(float, sp.get("bbox", block_bbox)))
+                        t, cbb = _chars_text_bbox(sp.get("chars") or [])
+                        if cbb:
+                            bb = blk_bb = cbb
                         else:
                             bb = tuple(map(float, sp.get("bbox", block_bbox)))
-                    if t: txts.append(t)
-                    rects.append(bb); sizes.append(float(sp.get("size", 11.5)))
+                            blk_bb = tuple(map(float, block_bbox))
+                    size = float(sp.get("size", 11.5))
+                    if t:
+                        txts.append(t)
+                        # span geometry prefers the span's own bbox
+                        if sp.get("bbox"): sbb = tuple(map(float, sp["bbox"]))
+                        else:
+                            sbb = (cbb or _chars_text_bbox(sp.get("chars") or [])[1]
+                                   or tuple(map(float, block_bbox)))
+                        out_spans.append(Span(pno, (sbb[0],sbb[1],sbb[2],sbb[3]), t, size,
+                                              normalize_color(sp.get("color", (0,0,0))),
+                                              sp.get("font", "helv"), int(sp.get("flags", 0))))
+                    rects.append(bb); sizes.append(size)
+                    if blocks:
+                        block_rects.append(blk_bb); block_sizes.append(size)
+                if blocks and txts:
+                    block_text_lines.append(" ".join(txts))
+                if not lines or not spans: continue
                 line_text = " ".join(" ".join(txts).split())
                 if not line_text: continue
                 x0=min(r[0] for r in rects); y0=min(r[1] for r in rects)
                 x1=max(r[2] for r in rects); y1=max(r[3] for r in rects)
-                x1=max(r[2] for r in rects); y1=max(r[3] for r in rects)
-                avg_size = sum(sizes)/max(1, len(sizes))
                 # Heuristic for flags/font: take from first span
                 first_span = spans[0]
-                font = first_span.get("font", "helv")
-                flags = int(first_span.get("flags", 0))
-                lines.append(Line(pno, (x0,y0,x1,y1), line_text, avg_size, (0.0,), font, flags))
-    return lines
-
-def extract_blocks_from_textlayer(doc: fitz.Document) -> List[Block]:
-    blocks: List[Block] = []
-    for pno in range(len(doc)):
-        raw = _rawdict(doc[pno])
-        for b in raw.get("blocks", []):
-            if "lines" not in b: continue
-            block_rects: List[Tuple[float,float,float,float]] = []
-            block_text_lines: List[str] = []; sizes: List[float] = []
-            for ln in b.get("lines", []):
-                line_txts, line_rects, line_sizes = [], [], []
-                for sp in ln.get("spans", []):
-                    if isinstance(sp.get("text"), str) and sp["text"].strip():
-                        t = " ".join(sp["text"].split())
-                        bb = tuple(map(float, sp.get("bbox", b.get("bbox",(0,0,0,0)))))
-                    else:
-                        chars = sp.get("chars") or []
-                        t = "".join(ch.get("c","") for ch in chars).strip()
-                        if chars:
-                            xs0=[c["bbox"][0] for c in chars if "bbox" in c]
-                            ys0=[c["bbox"][1] for c in chars if "bbox" in c]
-                            xs1=[c["bbox"][2] for c in chars if "bbox" in c]
-                            ys1=[c["bbox"][3] for c in chars if "bbox" in c]
-                            bb = (min(xs0),min(ys0),max(xs1),max(ys1)) if xs0 else tuple(map(float, b.get("bbox",(0,0,0,0))))
-                        else:
-                            bb = tuple(map(float, b.get("bbox",(0,0,0,0))))
-                    if t: line_txts.append(t)
-                    line_rects.append(bb); line_sizes.append(float(sp.get("size",11.5)))
-                if line_txts: block_text_lines.append(" ".join(line_txts))
-                block_rects.extend(line_rects); sizes.extend(line_sizes)
-            if not block_text_lines or not block_rects: continue
+                out_lines.append(Line(pno, (x0,y0,x1,y1), line_text, sum(sizes)/len(sizes), (0.0,),
+                                      first_span.get("font", "helv"), int(first_span.get("flags", 0))))
+            if not blocks or not block_text_lines or not block_rects: continue
             x0=min(r[0] for r in block_rects); y0=min(r[1] for r in block_rects)
             x1=max(r[2] for r in block_rects); y1=max(r[3] for r in block_rects)
-            try: avg_size = statistics.median(sizes)
-            except statistics.StatisticsError: avg_size = sizes[0] if sizes else 11.5
-            text = "\n".join(block_text_lines).strip()
-            # Heuristic for flags/font: take from first line -> first span
+            avg_size = _median(block_sizes) if block_sizes else 11.5
             try:
                 first_sp = b.get("lines", [])[0].get("spans", [])[0]
                 font = first_sp.get("font", "helv")
                 flags = int(first_sp.get("flags", 0))
             except:
                 font = "helv"; flags = 0
-            blocks.append(Block(pno, (x0,y0,x1,y1), text, avg_size, (0.0,), font, flags))
-    return blocks
-
-def derive_line_styles_from_spans(lines: List[Line], spans: List[Span]) -> None:
-    spans_by_page: Dict[int, List[Span]] = {}
-    for sp in spans: spans_by_page.setdefault(sp.page, []).append(sp)
-    for ln in lines:
-        sps = [sp for sp in spans_by_page.get(ln.page, [])
-               if rect_iou(ln.rect, sp.rect) > 0.5 or point_in_rect(rect_center(sp.rect), ln.rect)]
+            out_blocks.append(Block(pno, (x0,y0,x1,y1), "\n".join(block_text_lines).strip(),
+                                    avg_size, (0.0,), font, flags))
+    return out_spans, out_lines, out_blocks
+
+def _spans_under(items, spans: List[Span], iou_min: float, centers: bool = True,
+                 spans_by_page: Optional[Dict[int, List[Span]]] = None):
+    """Yield (item, [spans matched by rect_matches on the item's page, in span order]) for every item."""
+    if spans_by_page is None:
+        spans_by_page = group_by_page(spans)
+    for pno, page_items in group_by_page(items).items():
+        page_spans = spans_by_page.get(pno, [])
+        hits = rect_matches([it.rect for it in page_items], [sp.rect for sp in page_spans], iou_min, centers)
+        for it, idx in zip(page_items, hits):
+            yield it, [page_spans[i] for i in idx]
+
+def derive_line_styles_from_spans(lines: List[Line], spans: List[Span],
+                                  spans_by_page: Optional[Dict[int, List[Span]]] = None) -> None:
+    for ln, sps in _spans_under(lines, spans, 0.5, spans_by_page=spans_by_page):
         if not sps: continue
         sizes = [sp.fontsize for sp in sps]
-        try: ln.fontsize = statistics.median(sizes)
-        except statistics.StatisticsError: ln.fontsize = sizes[0]
-        color_counts: Dict[Tuple[float, ...], int] = {}
-        for sp in sps: color_counts[sp.color] = color_counts.get(sp.color, 0) + 1
-        ln.color = max(color_counts.items(), key=lambda kv: kv[1])[0]
+        ln.fontsize = _median(sizes)
+        ln.color = Counter(sp.color for sp in sps).most_common(1)[0][0]
         # Transfer font/flags (assume dominance)
         ln.font = sps[0].font; ln.flags = sps[0].flags
 
-def derive_block_styles_from_spans(blocks: List[Block], spans: List[Span]) -> None:
-    spans_by_page: Dict[int, List[Span]] = {}
-    for sp in spans: spans_by_page.setdefault(sp.page, []).append(sp)
-    for bl in blocks:
-        sps = [sp for sp in spans_by_page.get(bl.page, [])
-               if rect_iou(bl.rect, sp.rect) > 0.4 or point_in_rect(rect_center(sp.rect), bl.rect)]
+def derive_block_styles_from_spans(blocks: List[Block], spans: List[Span],
+                                   spans_by_page: Optional[Dict[int, List[Span]]] = None) -> None:
+    for bl, sps in _spans_under(blocks, spans, 0.4, spans_by_page=spans_by_page):
         if not sps: continue
         sizes = [sp.fontsize for sp in sps]
-        try: bl.fontsize = statistics.median(sizes)
-        except statistics.StatisticsError: bl.fontsize = sizes[0]
-        color_counts: Dict[Tuple[float, ...], int] = {}
-        for sp in sps: color_counts[sp.color] = color_counts.get(sp.color, 0) + 1
-        bl.color = max(color_counts.items(), key=lambda kv: kv[1])[0]
+        bl.fontsize = _median(sizes)
+        bl.color = Counter(sp.color for sp in sps).most_common(1)[0][0]
         # Transfer font/flags
         bl.font = sps[0].font; bl.flags = sps[0].flags
 
-def map_block_styles_from_spans(blocks: List[Block], spans: List[Span]) -> None:
-    spans_by_page: Dict[int, List[Span]] = {}
-    for sp in spans:
-        spans_by_page.setdefault(sp.page, []).append(sp)
-
-    for bl in blocks:
-        sps = [sp for sp in spans_by_page.get(bl.page, [])
-               if (max(0.0, min(bl.rect[2], sp.rect[2]) - max(bl.rect[0], sp.rect[0])) *
-                   max(0.0, min(bl.rect[3], sp.rect[3]) - max(bl.rect[1], sp.rect[1]))) > 0]
+def map_block_styles_from_spans(blocks: List[Block], spans: List[Span],
+                                spans_by_page: Optional[Dict[int, List[Span]]] = None) -> None:
+    # any positive-area overlap counts (IoU > 0), no center test
+    for bl, sps in _spans_under(blocks, spans, 0.0, centers=False, spans_by_page=spans_by_page):
         if not sps: 
             continue
         sizes = [sp.fontsize for sp in sps]
-        try:
-            bl.fontsize = statistics.median(sizes)
-        except statistics.StatisticsError:
-            bl.fontsize = sizes[0]
-        color_counts: Dict[Tuple[float, ...], int] = {}
-        for sp in sps:
-            color_counts[sp.color] = color_counts.get(sp.color, 0) + 1
-        bl.color = max(color_counts.items(), key=lambda kv: kv[1])[0]
\ No newline at end of file
+        bl.fontsize = _median(sizes)
+        bl.color = Counter(sp.color for sp in sps).most_common(1)[0][0]
\ No newline at end of file
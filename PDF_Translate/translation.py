@@ -1,11 +1,12 @@
 from abc import ABC, abstractmethod
 from typing import Optional, List
 import os
+import logging
 import asyncio
-import nest_asyncio
+import threading
+from functools import lru_cache
 
-# Apply nest_asyncio to support nested event loops if necessary
-nest_asyncio.apply()
+log = logging.getLogger(__name__)
 
 class Translator(ABC):
     @abstractmethod
@@ -16,12 +17,46 @@ class Translator(ABC):
         """
         pass
 
+    # True when translate_batch sends all texts in one request (callers then skip their thread pool)
+    supports_batch: bool = False
+    # Texts per translate_batch call on the bulk path
+    batch_size: int = 100
+    # ... and at most this many characters of text per call (None: no limit)
+    batch_chars: Optional[int] = None
+    # translate_batch calls allowed in flight at once (thread-safe clients without a strict rate limit)
+    batch_concurrency: int = 1
+
+    def translate_batch(self, texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+        """
+        Translate several texts sharing one language pair; results come back in input order.
+        Default is one translate() call per text; providers with a bulk API override this.
+        """
+        return [self.translate(t, source_lang, target_lang) for t in texts]
+
 class GoogleTranslator(Translator):
+    supports_batch = True
+    # googletrans answers a list with one request per text, gathered under a semaphore of this
+    # size on the shared httpx client; one at a time, as the pipeline's guard: it hangs on more
+    list_concurrency: int = 1
+
     def __init__(self):
         from googletrans import Translator as GTranslator
-        self.service = GTranslator(timeout=10, service_urls=["translate.googleapis.com"])
-    
-    
+        self.service = GTranslator(timeout=10, service_urls=["translate.googleapis.com"],
+                                   list_operation_max_concurrency=self.list_concurrency)
+        # googletrans 4 is async and its httpx client keeps connections on the loop that opened
+        # them: every call runs on this one loop, kept running in a daemon thread. Submitting
+        # from any thread works the same, including one that already runs a loop (notebooks).
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="googletrans-loop", daemon=True).start()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def __del__(self):
+        loop = getattr(self, "_loop", None)
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+
     def translate(self, text, source_lang: str, target_lang: str):
         import time, random
         try:
@@ -31,21 +66,10 @@ class GoogleTranslator(Translator):
             # Rate limit protection: Sleep randomized 0.5 - 1.5s (only ONCE per batch now)
             time.sleep(random.uniform(0.5, 1.5))
             
-            # Use asyncio.run if possible, else handle existing loop
             res = self.service.translate(text, src=src, dest=target_lang)
-            
             if asyncio.iscoroutine(res):
-                try:
-                    loop = asyncio.get_event_loop()
-                except RuntimeError:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                
-                if loop.is_running():
-                    res = loop.run_until_complete(res)
-                else:
-                    res = loop.run_until_complete(res)
-            
+                res = self._run(res)
+
             if isinstance(res, list):
                 return [getattr(r, "text", "") for r in res]
             else:
@@ -55,35 +79,94 @@ class GoogleTranslator(Translator):
             # Return original if failed (graceful fallback)
             return text if not isinstance(text, list) else text
 
+    def translate_batch(self, texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+        # googletrans takes a list and translates its texts concurrently (see list_concurrency)
+        res = self.translate(list(texts), source_lang, target_lang)
+        if isinstance(res, list) and len(res) == len(texts):
+            return res
+        return list(texts)
+
 class DeepLTranslator(Translator):
+    supports_batch = True
+    # the /v2/translate endpoint takes at most 50 texts and a 128 KiB body per request
+    # (Devanagari is 3 bytes per character in UTF-8)
+    batch_size = 50
+    batch_chars = 40_000
+    batch_concurrency = 4
+
     def __init__(self, api_key: str):
         import deepl
         self.translator = deepl.Translator(api_key)
+
+    @staticmethod
+    def _lang_codes(source_lang: str, target_lang: str):
+        # DeepL uses 'source_lang' and 'target_lang'
+        # Note: DeepL Source lang is optional (auto-detect)
+        # Target lang requires specific codes (EN-US or EN-GB for English target)
+        target = target_lang.upper()
+        if target == "EN":
+            target = "EN-US" # Default to US English
+        source = source_lang.upper() if source_lang != "auto" else None
+        return source, target
         
     def translate(self, text: str, source_lang: str, target_lang: str) -> str:
         try:
-            # DeepL uses 'source_lang' and 'target_lang'
-            # Note: DeepL Source lang is optional (auto-detect)
-            # Target lang requires specific codes (EN-US or EN-GB for English target)
-            
-            target = target_lang.upper()
-            if target == "EN":
-                target = "EN-US" # Default to US English
-                
-            source = source_lang.upper() if source_lang != "auto" else None
-            
+            source, target = self._lang_codes(source_lang, target_lang)
             result = self.translator.translate_text(text, source_lang=source, target_lang=target)
             return result.text
         except Exception as e:
-            print(f"[DeepLTranslator] Error: {e}")
+            log.warning("[DeepLTranslator] Error: %s", e)
             return text
 
+    def translate_batch(self, texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+        # translate_text accepts a list and returns one result per entry, in order
+        try:
+            source, target = self._lang_codes(source_lang, target_lang)
+            results = self.translator.translate_text(list(texts), source_lang=source, target_lang=target)
+            return [r.text for r in results]
+        except Exception as e:
+            log.warning("[DeepLTranslator] Error: %s", e)
+            return list(texts)
+
 class OpenAITranslator(Translator):
+    supports_batch = True
+    # Whole blocks go out in one completion; keep a batch well inside the output token limit
+    batch_size = 20
+    batch_chars = 6_000
+    batch_concurrency = 4
+
     def __init__(self, api_key: str, model: str = "gpt-4o-mini"):
         from openai import OpenAI
         self.client = OpenAI(api_key=api_key)
         self.model = model
         
+    def translate_batch(self, texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+        # Texts go in and come back as a JSON array, so items containing newlines or
+        # numbering survive; a reply that doesn't parse to one string per input falls
+        # back to one request per text.
+        import json
+        try:
+            prompt = (f"Translate each string of the following JSON array from {source_lang} to {target_lang}. "
+                      f'Reply with a JSON object {{"translations": [...]}} holding exactly {len(texts)} strings, '
+                      "in the same order, preserving formatting and whitespace as much as possible:\n\n"
+                      + json.dumps(list(texts), ensure_ascii=False))
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "You are a professional translator. Translate the user input accurately."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                response_format={"type": "json_object"},
+            )
+            out = json.loads(response.choices[0].message.content).get("translations")
+            if isinstance(out, list) and len(out) == len(texts) and all(isinstance(t, str) for t in out):
+                return [t.strip() for t in out]
+            log.warning("[OpenAITranslator] Batch reply had the wrong shape; translating one by one")
+        except Exception as e:
+            log.warning("[OpenAITranslator] Batch error: %s; translating one by one", e)
+        return [self.translate(t, source_lang, target_lang) for t in texts]
+
     def translate(self, text: str, source_lang: str, target_lang: str) -> str:
         try:
             prompt = f"Translate the following text from {source_lang} to {target_lang}. Return only the translated text, preserving original formatting and whitespace as much as possible:\n\n{text}"
@@ -98,7 +181,7 @@ class OpenAITranslator(Translator):
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
-            print(f"[OpenAITranslator] Error: {e}")
+            log.warning("[OpenAITranslator] Error: %s", e)
             return text
 
 class OllamaTranslator(Translator):
@@ -112,7 +195,8 @@ class OllamaTranslator(Translator):
         except ImportError:
             self.has_client = False
             import requests
-            self.requests = requests
+            # one Session: every text reuses the same keep-alive connection to the server
+            self.session = requests.Session()
             self.base_url = "http://localhost:11434/api/generate"
 
     def translate(self, text: str, source_lang: str, target_lang: str) -> str:
@@ -132,24 +216,31 @@ class OllamaTranslator(Translator):
                     "prompt": prompt,
                     "stream": False
                 }
-                resp = self.requests.post(self.base_url, json=data)
+                resp = self.session.post(self.base_url, json=data)
                 if resp.status_code == 200:
                     return resp.json().get("response", "").strip()
                 else:
-                    print(f"[OllamaTranslator] API Error: {resp.text}")
+                    log.warning("[OllamaTranslator] API Error: %s", resp.text)
                     return text
         except Exception as e:
-             print(f"[OllamaTranslator] Error: {e}")
+             log.warning("[OllamaTranslator] Error: %s", e)
              return text
 
+# Provider SDKs are imported inside each translator's __init__, so only the chosen one loads
+_PROVIDERS = {
+    "Google": lambda kw: GoogleTranslator(),
+    "DeepL": lambda kw: DeepLTranslator(api_key=kw.get("api_key")),
+    "OpenAI": lambda kw: OpenAITranslator(api_key=kw.get("api_key"), model=kw.get("model", "gpt-4o-mini")),
+    "Ollama": lambda kw: OllamaTranslator(model=kw.get("model", "llama3")),
+}
+
+@lru_cache(maxsize=8)
 def get_translator(provider: str, **kwargs) -> Translator:
-    if provider == "Google":
-        return GoogleTranslator()
-    elif provider == "DeepL":
-        return DeepLTranslator(api_key=kwargs.get("api_key"))
-    elif provider == "OpenAI":
-        return OpenAITranslator(api_key=kwargs.get("api_key"), model=kwargs.get("model", "gpt-4o-mini"))
-    elif provider == "Ollama":
-        return OllamaTranslator(model=kwargs.get("model", "llama3"))
-    else:
+    """
+    The translator for `provider`, one per (provider, settings) per process: repeated runs
+    reuse its HTTP client, open connections and event loop instead of building new ones.
+    """
+    factory = _PROVIDERS.get(provider)
+    if factory is None:
         raise ValueError(f"Unknown provider: {provider}")
+    return factory(kwargs)
@@ -1,12 +1,35 @@
 from dataclasses import dataclass
-from typing import Any, Tuple, List, Optional
-import fitz, os
+from typing import Any, Dict, Tuple, List, Optional, Callable
+from collections import defaultdict
+from functools import lru_cache
+import fitz, os, multiprocessing, threading
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
-from .constants import _LAT, _DEV
+# Worker processes are spawned once and kept: each spawn re-imports fitz/numpy/this package,
+# which a server translating document after document would otherwise pay on every run.
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_SIZE = 0
+_POOL_LOCK = threading.Lock()
+
+def _shared_pool(num_workers: int) -> ProcessPoolExecutor:
+    """The package's process pool, (re)created when the worker count changes or a worker died."""
+    global _POOL, _POOL_SIZE
+    with _POOL_LOCK:
+        if _POOL is not None and (_POOL_SIZE != num_workers or getattr(_POOL, "_broken", False)):
+            # other callers (e.g. concurrent Streamlit sessions) may still have work queued on the
+            # old pool: it finishes that work, then its workers exit
+            _POOL.shutdown(wait=False)
+            _POOL = None
+        if _POOL is None:
+            ctx = multiprocessing.get_context("spawn")  # fork is unsafe with MuPDF on macOS
+            _POOL = ProcessPoolExecutor(max_workers=num_workers, mp_context=ctx)
+            _POOL_SIZE = num_workers
+        return _POOL
 
 # ------------------ dataclasses ------------------
-@dataclass
+# slots: documents carry tens of thousands of these, so no per-instance __dict__
+@dataclass(slots=True)
 class Span:
     page: int
     rect: Tuple[float, float, float, float]
@@ -16,7 +39,7 @@ class Span:
     font: str = "helv"
     flags: int = 0
 
-@dataclass
+@dataclass(slots=True)
 class Line:
     page: int
     rect: Tuple[float, float, float, float]
@@ -26,7 +49,7 @@ class Line:
     font: str = "helv"
     flags: int = 0
 
-@dataclass
+@dataclass(slots=True)
 class Block:
     page: int
     rect: Tuple[float, float, float, float]
@@ -36,11 +59,21 @@ class Block:
     font: str = "helv"
     flags: int = 0
 
+def group_by_page(items) -> Dict[int, list]:
+    """Spans/lines/blocks (anything with .page) grouped by page, in their original order."""
+    by_page: Dict[int, list] = defaultdict(list)
+    for it in items:
+        by_page[it.page].append(it)
+    return by_page
+
+@lru_cache(maxsize=256)  # MuPDF span colors are sRGB ints; a document repeats a handful of them
+def _srgb_int_color(c: int) -> Tuple[float, float, float]:
+    r = (c >> 16) & 255; g = (c >> 8) & 255; b = c & 255
+    return (r/255.0, g/255.0, b/255.0)
+
 def normalize_color(c: Any) -> Tuple[float, ...]:
     if c is None: return (0.0,)
-    if isinstance(c, int):
-        r = (c >> 16) & 255; g = (c >> 8) & 255; b = c & 255
-        return (r/255.0, g/255.0, b/255.0)
+    if isinstance(c, int): return _srgb_int_color(c)
     if isinstance(c, str):
         s = c.strip().lstrip("#")
         if len(s) == 6:
@@ -56,6 +89,8 @@ def normalize_color(c: Any) -> Tuple[float, ...]:
 
 def rect_iou(a, b) -> float:
     ax0, ay0, ax1, ay1 = a; bx0, by0, bx1, by1 = b
+    # most pairs don't touch: a separating axis settles them before any min/max or area math
+    if ax1 <= bx0 or bx1 <= ax0 or ay1 <= by0 or by1 <= ay0: return 0.0
     ix0, iy0 = max(ax0, bx0), max(ay0, by0)
     ix1, iy1 = min(ax1, bx1), min(ay1, by1)
     w, h = max(0.0, ix1-ix0), max(0.0, iy1-iy0)
@@ -73,6 +108,33 @@ def center_dist(a,b):
     cx,cy=rect_center(a); dx,dy=rect_center(b)
     return ((cx-dx)**2 + (cy-dy)**2)**0.5
 
+def rect_matches(targets, rects, iou_min: float, centers: bool = True, chunk: int = 256) -> List[List[int]]:
+    """
+    For every target rect, the (ascending) indices of `rects` with rect_iou > iou_min or,
+    if `centers`, whose center lies inside the target. One (targets x rects) broadcast per
+    `chunk` targets instead of a rect_iou/point_in_rect call per pair.
+    """
+    import numpy as np
+    t_all = np.asarray(targets, dtype=np.float64).reshape(-1, 4)
+    r = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+    out: List[List[int]] = []
+    if not len(r):
+        return [[] for _ in range(len(t_all))]
+    r_area = (r[:, 2] - r[:, 0]) * (r[:, 3] - r[:, 1])
+    rcx = (r[:, 0] + r[:, 2]) / 2.0; rcy = (r[:, 1] + r[:, 3]) / 2.0
+    for k in range(0, len(t_all), chunk):
+        t = t_all[k:k + chunk]
+        x0, y0, x1, y1 = (t[:, j:j + 1] for j in range(4))
+        w = np.maximum(0.0, np.minimum(x1, r[:, 2]) - np.maximum(x0, r[:, 0]))
+        h = np.maximum(0.0, np.minimum(y1, r[:, 3]) - np.maximum(y0, r[:, 1]))
+        inter = w * h
+        union = np.maximum(1e-9, (x1 - x0) * (y1 - y0) + r_area - inter)
+        hit = (inter > 0) & (inter / union > iou_min)
+        if centers:
+            hit |= (x0 <= rcx) & (rcx <= x1) & (y0 <= rcy) & (rcy <= y1)
+        out.extend(np.flatnonzero(row).tolist() for row in hit)
+    return out
+
 def _to_rgb(color: Tuple[float, ...]) -> Tuple[float, float, float]:
     """Normalize 1/3/4-tuple colors into RGB (0..1)."""
     if not color:
@@ -90,26 +152,172 @@ def _rel_luminance(rgb: Tuple[float, float, float]) -> float:
     r, g, b = rgb
     return 0.2126 * r + 0.7152 * g + 0.0722 * b
 
+@lru_cache(maxsize=256)  # a document uses a handful of text colors across thousands of spans
+def _color_luminance(color: Tuple[float, ...]) -> float:
+    """_rel_luminance of a span color (1/3/4-tuple)."""
+    return _rel_luminance(_to_rgb(color))
+
+class SpanIndex:
+    """
+    Spans as page-sorted columns (rects, text luminance) so a rect query slices one page
+    with searchsorted and tests all of its spans at once instead of looping over Span objects.
+    Within a page spans are sorted by y0, so a query only tests the band of spans that can
+    reach its rect vertically.
+    """
+    # rects per broadcast in mean_luminances: bounds the (rects x spans) temporaries on dense pages
+    _CHUNK = 128
+
+    def __init__(self, spans: List[Span]):
+        import numpy as np
+        order = sorted(range(len(spans)), key=lambda i: (spans[i].page, spans[i].rect[1]))
+        n = len(order)
+        self.page = np.fromiter((spans[i].page for i in order), dtype=np.int64, count=n)
+        self.rects = np.array([spans[i].rect for i in order], dtype=np.float64).reshape(n, 4)
+        self.lum = np.fromiter((_color_luminance(spans[i].color) for i in order), dtype=np.float64, count=n)
+        # tallest span per page: a span can only reach down to y0 + max height
+        starts = np.flatnonzero(np.r_[True, self.page[1:] != self.page[:-1]]) if n else np.zeros(0, np.int64)
+        heights = np.maximum(self.rects[:, 3] - self.rects[:, 1], 0.0)
+        self._max_h = dict(zip(self.page[starts].tolist(), np.maximum.reduceat(heights, starts).tolist())) if n else {}
+
+    def _band(self, pno: int, y0: float, y1: float) -> Tuple[int, int]:
+        """Index range of page `pno` spans whose vertical extent can touch [y0, y1]."""
+        import numpy as np
+        lo = int(np.searchsorted(self.page, pno, "left"))
+        hi = int(np.searchsorted(self.page, pno, "right"))
+        if hi == lo:
+            return lo, hi
+        ys = self.rects[lo:hi, 1]
+        b0 = lo + int(np.searchsorted(ys, y0 - self._max_h[pno], "left"))
+        b1 = lo + int(np.searchsorted(ys, y1, "right"))
+        return b0, max(b0, b1)
+
+    def luminances_near(self, pno: int, rect, iou_min: float = 0.10):
+        """Luminance of every span on page `pno` overlapping `rect` (IoU > iou_min) or centered inside it."""
+        import numpy as np
+        x0, y0, x1, y1 = rect
+        lo, hi = self._band(pno, y0, y1)
+        r = self.rects[lo:hi]
+        iw = np.clip(np.minimum(r[:, 2], x1) - np.maximum(r[:, 0], x0), 0.0, None)
+        ih = np.clip(np.minimum(r[:, 3], y1) - np.maximum(r[:, 1], y0), 0.0, None)
+        inter = iw * ih
+        union = np.maximum(1e-9, (r[:, 2] - r[:, 0]) * (r[:, 3] - r[:, 1]) + (x1 - x0) * (y1 - y0) - inter)
+        cx = (r[:, 0] + r[:, 2]) / 2.0; cy = (r[:, 1] + r[:, 3]) / 2.0
+        inside = (x0 <= cx) & (cx <= x1) & (y0 <= cy) & (cy <= y1)
+        return self.lum[lo:hi][(inter / union > iou_min) | inside]
+
+    def mean_luminances(self, pno: int, rects, iou_min: float = 0.10):
+        """
+        luminances_near for many rects on one page as (rects x spans) broadcasts.
+        Rects are taken in y order, _CHUNK at a time, each chunk against its own span band.
+        Returns the mean luminance per rect, NaN where no span qualifies.
+        """
+        import numpy as np
+        q_all = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        res = np.full(len(q_all), np.nan)
+        by_y = np.argsort(q_all[:, 1], kind="stable")
+        for c in range(0, len(by_y), self._CHUNK):
+            sel = by_y[c:c + self._CHUNK]
+            q = q_all[sel]
+            lo, hi = self._band(pno, float(q[:, 1].min()), float(q[:, 3].max()))
+            if hi == lo:
+                continue
+            r = self.rects[lo:hi]
+            x0, y0, x1, y1 = (q[:, k:k + 1] for k in range(4))
+            iw = np.clip(np.minimum(r[:, 2], x1) - np.maximum(r[:, 0], x0), 0.0, None)
+            ih = np.clip(np.minimum(r[:, 3], y1) - np.maximum(r[:, 1], y0), 0.0, None)
+            inter = iw * ih
+            union = np.maximum(1e-9, (r[:, 2] - r[:, 0]) * (r[:, 3] - r[:, 1]) + (x1 - x0) * (y1 - y0) - inter)
+            cx = (r[:, 0] + r[:, 2]) / 2.0; cy = (r[:, 1] + r[:, 3]) / 2.0
+            hit = (inter / union > iou_min) | ((x0 <= cx) & (cx <= x1) & (y0 <= cy) & (cy <= y1))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                res[sel] = (hit @ self.lum[lo:hi]) / hit.sum(axis=1)
+        return res
+
+def _median(vals: List[float]) -> float:
+    """Median of a non-empty list; statistics.median without its type dispatch (lists here are font sizes)."""
+    n = len(vals)
+    if n == 1:
+        return vals[0]
+    if n == 2:
+        return (vals[0] + vals[1]) / 2
+    v = sorted(vals); h = n // 2
+    return v[h] if n % 2 else (v[h - 1] + v[h]) / 2
+
+@lru_cache(maxsize=256)
 def pick_redact_fill_for_color(color: Tuple[float, ...]) -> Tuple[float, float, float]:
     """
     If text is very light (close to white), redact with black; else white.
     Threshold 0.85 works well for PDFs.
     """
-    L = _rel_luminance(_to_rgb(color))
+    L = _color_luminance(color)
     return (0.0, 0.0, 0.0) if L >= 0.85 else (1.0, 1.0, 1.0)
 
+# every byte but A-Z/a-z; UTF-8 continuation/lead bytes are never ASCII letters
+_NON_LATIN_BYTES = bytes(b for b in range(256) if not (0x41 <= b <= 0x5A or 0x61 <= b <= 0x7A))
+
+@lru_cache(maxsize=4096)  # headers/footers/table cells repeat across pages and modes
+def _script_counts(text: str) -> Tuple[int, int]:
+    """(Devanagari, Latin) letter counts of `text`."""
+    # Counts the same characters as _DEV/_LAT, on the UTF-8 bytes without building match lists:
+    # U+0900..U+097F encode as E0 A4 xx / E0 A5 xx, and E0 only ever starts a sequence.
+    b = (text or "").encode("utf-8", "surrogatepass")
+    return b.count(b"\xe0\xa4") + b.count(b"\xe0\xa5"), len(b.translate(None, _NON_LATIN_BYTES))
+
 def _dominant_script(text: str) -> str:
-    dev = len(_DEV.findall(text or "")); lat = len(_LAT.findall(text or ""))
+    dev, lat = _script_counts(text)
     if dev > lat: return "hi"
     if lat > dev: return "en"
     return "auto"
 
-def build_base(src_pdf: str) -> Tuple[fitz.Document, fitz.Document]:
-    src = fitz.open(src_pdf); out = fitz.open()
-    for p in range(len(src)):
+# Base copies are built in worker processes from this many pages up.
+_PARALLEL_MIN_BASE_PAGES = 128
+
+def build_base(src_pdf: str, num_workers: Optional[int] = 1) -> Tuple[fitz.Document, fitz.Document]:
+    """
+    The source document and an output copy with every source page shown as its background.
+    With num_workers > 1 (None: up to 4), long documents are copied in page ranges on the
+    shared process pool and the parts appended in page order.
+    """
+    src = fitz.open(src_pdf); n = len(src)
+    if num_workers is None:
+        num_workers = min(os.cpu_count() or 1, 4)
+    if num_workers > 1 and n >= _PARALLEL_MIN_BASE_PAGES:
+        step = -(-n // num_workers)
+        futs = [_shared_pool(num_workers).submit(_base_range_worker, src_pdf, p, min(p + step, n))
+                for p in range(0, n, step)]
+        out = fitz.open()
+        for fut in futs:
+            with fitz.open(stream=fut.result(), filetype="pdf") as part:
+                out.insert_pdf(part)
+        return src, out
+    return src, _base_range(src, 0, n)
+
+def _base_range(src: fitz.Document, start: int, stop: int) -> fitz.Document:
+    out = fitz.open()
+    p = start
+    while p < stop:
+        q = p
+        while q < stop and _upright_uncropped(src[q]):
+            q += 1
+        if q > p:
+            # already in output geometry: one structural copy for the run, no per-page form XObject;
+            # annotations, links and widgets stay behind, as with show_pdf_page
+            out.insert_pdf(src, from_page=p, to_page=q - 1, links=False, annots=False, widgets=False)
+            p = q
+            continue
+        # rotated / cropped pages are reprojected onto an upright page of the visible size
         po = out.new_page(width=src[p].rect.width, height=src[p].rect.height)
         po.show_pdf_page(po.rect, src, p)
-    return src, out
+        p += 1
+    return out
+
+def _upright_uncropped(page: fitz.Page) -> bool:
+    return not page.rotation and page.cropbox == page.mediabox and page.cropbox.tl == (0, 0)
+
+def _base_range_worker(src_pdf: str, start: int, stop: int) -> bytes:
+    """Worker: build_base's output pages [start, stop) of `src_pdf`, as PDF bytes."""
+    with fitz.open(src_pdf) as src:
+        return _base_range(src, start, stop).tobytes()
 
 def choose_langs(text: str, translate_dir: str) -> Tuple[str,str]:
     if translate_dir == "hi->en": return "hi","en"
@@ -119,64 +327,120 @@ def choose_langs(text: str, translate_dir: str) -> Tuple[str,str]:
     if sl == "en": return "en","hi"
     return "hi","en"
 
+_FIXED_DIRS = {"hi->en": ("hi", "en"), "en->hi": ("en", "hi"), "en->vi": ("en", "vi")}
+
+def direction_picker(translate_dir: str, auto_en_target: str = "hi") -> Callable[[str], Tuple[str, str]]:
+    """
+    Resolve translate_dir once and return text -> (src, dest).
+    Fixed directions ignore the text; "auto" detects the script per text
+    (hi -> en, en -> auto_en_target, anything else -> hi -> en).
+    """
+    pair = _FIXED_DIRS.get(translate_dir)
+    if pair is not None:
+        return lambda _text: pair
+
+    def pick(text: str) -> Tuple[str, str]:
+        sl = _dominant_script(text)
+        if sl == "hi": return "hi", "en"
+        if sl == "en": return "en", auto_en_target
+        return "hi", "en"
+    return pick
+
+def direction_requests(texts: List[str], translate_dir: str,
+                       auto_en_target: str = "hi") -> List[Tuple[str, str, str]]:
+    """(text, src, dest) for every text; a fixed direction skips the per-text picker call."""
+    pair = _FIXED_DIRS.get(translate_dir)
+    if pair is not None:
+        sl, dl = pair
+        return [(t, sl, dl) for t in texts]
+    pick = direction_picker(translate_dir, auto_en_target)
+    return [(t, *pick(t)) for t in texts]
+
+def already_in_target(text: str, src: str, dest: str) -> bool:
+    """
+    True when translating `text` from src to dest cannot change it: the pair is a no-op,
+    the text is already in the dest script, or it has no Devanagari/Latin letters at all
+    (numbers, punctuation, other scripts). Such units keep their original glyphs.
+    """
+    if src == dest: return True
+    dev, lat = _script_counts(text)
+    if not dev and not lat: return True
+    # a Devanagari/Latin tie ("I am राम") is mixed text, not text already in dest
+    return (dev > lat and dest == "hi") or (lat > dev and dest == "en")
+
+def _draw_debug_rect(page: fitz.Page, r: fitz.Rect) -> None:
+    sh = page.new_shape(); sh.draw_rect(r)
+    sh.finish(width=0, color=None, fill=(1,0,0)); sh.commit(overlay=True)
+
 def insert_text_fit(page: fitz.Page, rect, text: str, fontname: str,
                     base_size: float, color: Tuple[float, ...],
                     fontfile: Optional[str] = None,
                     pad_px: Optional[float] = None,
-                    debug_outline: bool = False) -> bool:
-    r = fitz.Rect(*rect)
+                    debug_outline: bool = False,
+                    shape: Optional[fitz.Shape] = None) -> bool:
+    # With `shape` (from page.new_shape()) the text is added to it and the caller commits it
+    # once for all of a page's text; otherwise this call commits its own.
     if pad_px is None: pad_px = max(1.2, 0.20 * base_size)
-    r = fitz.Rect(r.x0 - pad_px, r.y0 - pad_px, r.x1 + pad_px, r.y1 + pad_px)
-    if debug_outline:
-        sh = page.new_shape(); sh.draw_rect(r)
-        sh.finish(width=0, color=None, fill=(1,0,0)); sh.commit(overlay=True)
+    # plain floats: insert_textbox takes a 4-tuple, so no Rect per call / per attempt
+    x0, y0, x1, y1 = rect
+    x0 -= pad_px; y0 -= pad_px; x1 += pad_px; y1 += pad_px
+    if debug_outline: _draw_debug_rect(page, fitz.Rect(x0, y0, x1, y1))
         
     # Iterative fitting
     # Boost base size slightly (5%) because Arial often looks smaller than source fonts
     # and increase line spacing to fill the vertical space better.
-    current_size = calculate_fitting_fontsize(page, (r.x0,r.y0,r.x1,r.y1), text, fontname, base_size * 1.05, fontfile)
+    current_size = calculate_fitting_fontsize(page, (x0, y0, x1, y1), text, fontname, base_size * 1.05, fontfile)
     
     # Define a minimum readable size. 
     MIN_READABLE_SIZE = 8.0 # Increased from 7.0
     
-    # Try inserting with shrinking until it fits
+    # Shrink ladder: current_size * 0.90**k, at most 15 rungs, stopping below 3.0. Every rung under
+    # the min readable size is the same attempt (min size, box expanded downwards with relaxed
+    # spacing), so only the first of those is kept.
+    ladder = []; expanded = False
     for attempt in range(15):
-        # Check against min readable size
-        effective_size = max(current_size, MIN_READABLE_SIZE)
-        
-        target_r = fitz.Rect(r)
-        if current_size < MIN_READABLE_SIZE:
-             # Expand downwards with relaxed spacing
-             # Line height 1.25 is standard for readability
-             extra_h = (MIN_READABLE_SIZE * 1.4) * 3 
-             target_r.y1 += extra_h
-             effective_size = MIN_READABLE_SIZE
-        
-        rv = page.insert_textbox(
-            target_r, text, fontname=fontname, fontfile=fontfile, fontsize=effective_size,
+        if current_size >= MIN_READABLE_SIZE:
+            ladder.append((current_size, y1))
+        elif not expanded:
+            # Line height 1.25 is standard for readability
+            extra_h = (MIN_READABLE_SIZE * 1.4) * 3
+            ladder.append((MIN_READABLE_SIZE, y1 + extra_h)); expanded = True
+        current_size *= 0.90
+        if current_size < 3.0: # safety break
+            break
+
+    # insert_textbox takes `lineheight` as a factor of fontsize, so even one line needs
+    # 1.25 * size**2 of height; rungs where that can't fit are certain failures. Sizes only
+    # shrink and boxes only grow along the ladder, so those form a prefix and are skipped.
+    lo, hi = 0, len(ladder)
+    while lo < hi and 1.25 * ladder[lo][0] ** 2 > max(0.0, ladder[lo][1] - y0) + 1e-3:
+        lo += 1
+    # Binary search for the first (largest) size that fits, laying out into uncommitted
+    # shapes; only the winner is committed to the page.
+    fitted = None
+    while lo < hi:
+        mid = (lo + hi) // 2
+        effective_size, target_y1 = ladder[mid]
+        sh = page.new_shape()
+        rv = sh.insert_textbox(
+            (x0, y0, x1, target_y1), text, fontname=fontname, fontfile=fontfile, fontsize=effective_size,
             lineheight=effective_size * 1.25, color=color, align=fitz.TEXT_ALIGN_LEFT, encoding=0
         )
-        
         if rv >= 0:
-            return True
-            
-        # If failed, shrink and retry
-        current_size *= 0.90
-        
-        # Loop break condition
-        if current_size < 3.0: # safety break
-             break
-             
-        # If we decided to force expansion (current_size < MIN), and it STILL failed?
-        # That means even with expanded box it failed? Unlikely unless massive text.
-        # But if we did expand, we should probably break/return True? 
-        # No, insert_textbox returns < 0 if it didn't fit.
-        # If we expanded and it still didn't fit, we might need to expand MORE?
-        
+            fitted, hi = sh, mid
+        else:
+            lo = mid + 1
+    if fitted is not None:
+        if shape is None:
+            fitted.commit(overlay=True)
+        else:
+            shape.text_cont += fitted.text_cont
+        return True
+
     # If we fall through, brute force insert_text at safe size
     safe_size = max(current_size, MIN_READABLE_SIZE)
-    page.insert_text(
-        fitz.Point(r.x0, r.y0 + safe_size),
+    (page if shape is None else shape).insert_text(
+        (x0, y0 + safe_size),
         text,
         fontname=fontname,
         fontfile=fontfile,
@@ -1,5 +1,5 @@
 # app.py
-import os, io, time, tempfile, zipfile, json, re
+import os, time, tempfile, zipfile, re, logging
 from pathlib import Path
 
 
@@ -18,15 +18,30 @@ from PDF_Translate.constants import (
     FONT_HI_PATH, FONT_HI_PATH_2, FONT_HI_LOGICAL_2
 )
 from PDF_Translate.textlayer import extract_original_page_objects
-from PDF_Translate.ocr import ocr_fix_pdf
-from PDF_Translate.utils import build_base, resolve_font
-from PDF_Translate.overlay import build_overlay_items_from_doc
-from PDF_Translate.overlay import build_overlay_items_from_doc
+from PDF_Translate.ocr import ocr_fix_pdf, needs_ocr
+from PDF_Translate.utils import build_base, resolve_font, _shared_pool
+from PDF_Translate.overlay import build_overlay_items_from_doc, OverlayConfig
 from PDF_Translate.pipeline import run_mode
 from PDF_Translate.translation import get_translator
 from PDF_Translate.layout import get_layout_analyzer
 
-from PDF_Translate.highlight_boxes import _hex_to_rgb01, add_boxes_to_pdf, build_annotation_items_from_pdf
+from PDF_Translate.highlight_boxes import _hex_to_rgb01, annotate_pdf_file
+
+# Pipeline progress/warnings go to the server console (no-op on Streamlit reruns)
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _render_page_png(pdf_bytes: bytes, page_num: int, dpi: int) -> bytes:
+    """One page of a PDF as PNG; cached so slider reruns don't re-rasterize pages seen before."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return doc[page_num].get_pixmap(dpi=dpi).tobytes("png")
+
+def _translation_cache_path(provider: str, model: str) -> str:
+    """Per-provider/model cache file in a directory only the current user can read."""
+    base = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "pdf_translate"
+    base.mkdir(mode=0o700, parents=True, exist_ok=True)
+    base.chmod(0o700)  # mkdir's mode is ignored for an existing directory
+    return str(base / f"{provider}_{re.sub(r'[^A-Za-z0-9.-]+', '_', model or 'default')}.json")
 
 # ----------------------------
 # Streamlit layout
@@ -47,6 +62,7 @@ with st.sidebar:
     dpi = st.text_input("OCR image DPI", DEFAULT_DPI)
     optimize = st.text_input("OCR optimize", DEFAULT_OPTIMIZE)
     skip_ocr = st.checkbox("Skip OCR", value=False)
+    skip_ocr_if_text = st.checkbox("Skip OCR if the PDF already has a text layer", value=False)
     auto_overlay = st.checkbox("Auto-build overlay (when overlay/all)", value=True)
     overlay_render = st.selectbox("Overlay render", ["image","textbox"], index=0)
     overlay_align = st.selectbox("Overlay align (0=left, 1=center, 2=right, 3=justify)", options=[0, 1, 2, 3], index=0)
@@ -75,6 +91,9 @@ with st.sidebar:
         tr_model = st.text_input("Model", "gpt-4o-mini")
     elif tr_provider == "Ollama":
         tr_model = st.text_input("Model", "llama3")
+    # off by default: the cache stores document text on this machine
+    remember_translations = st.checkbox("Remember translations between runs (private cache on this machine)",
+                                        value=False)
 
     st.markdown("---")
     st.subheader("Fonts")
@@ -147,7 +166,7 @@ if st.button("Run translation", disabled=pdf_file is None, type="primary"):
             orig_index = extract_original_page_objects(input_pdf_path)
 
             # Optionally OCR-fix PDF
-            if not skip_ocr:
+            if not skip_ocr and not (skip_ocr_if_text and not needs_ocr(input_pdf_path)):
                 try:
                     update_status("Running OCR (this may take a while)...")
                     ocr_start = time.time()
@@ -158,7 +177,8 @@ if st.button("Run translation", disabled=pdf_file is None, type="primary"):
                         lang=lang, 
                         dpi=dpi, 
                         optimize=optimize,
-                        progress_callback=update_status
+                        progress_callback=update_status,
+                        num_workers=None
                     )
                     
                     ocr_end = time.time()
@@ -170,12 +190,12 @@ if st.button("Run translation", disabled=pdf_file is None, type="primary"):
                     src_fixed = input_pdf_path
             else:
                 src_fixed = input_pdf_path
-                update_status("Skipping OCR...")
+                update_status("Skipping OCR..." if skip_ocr else "PDF already has a text layer; skipping OCR...")
             
             update_status("Preparing translation pipeline...")
 
             # Build base in/out paths
-            src, out = build_base(src_fixed)
+            src, out = build_base(src_fixed, num_workers=None)
 
             # Resolve fonts
             en_name, en_file = resolve_font(FONT_EN_LOGICAL, en_font_path)
@@ -238,19 +258,25 @@ if st.button("Run translation", disabled=pdf_file is None, type="primary"):
                 font_vn_name=vi_name, font_vn_file=vi_file,
                 output_pdf=output_pdf_path,
                 overlay_items=overlay_items,
-                overlay_render=overlay_render,
-                overlay_align={0:0,1:1,2:2,3:3}[overlay_align],
-                overlay_line_spacing=overlay_line_spacing,
-                overlay_margin_px=overlay_margin_px,
-                overlay_target_dpi=int(overlay_target_dpi),
-                overlay_scale_x=float(overlay_scale_x),
-                overlay_scale_y=float(overlay_scale_y),
-                overlay_off_x=float(overlay_off_x),
-                overlay_off_y=float(overlay_off_y),
+                overlay=OverlayConfig(
+                    render=overlay_render,
+                    align={0:0,1:1,2:2,3:3}[overlay_align],
+                    line_spacing=overlay_line_spacing,
+                    margin_px=overlay_margin_px,
+                    target_dpi=int(overlay_target_dpi),
+                    scale_x=float(overlay_scale_x),
+                    scale_y=float(overlay_scale_y),
+                    off_x=float(overlay_off_x),
+                    off_y=float(overlay_off_y),
+                ),
                 translator=translator,
                 use_ai_layout=("Surya" in layout_method),
                 layout_analyzer=layout_analyzer,
-                progress_callback=update_status # UX Callback
+                progress_callback=update_status, # UX Callback
+                num_workers=None,  # up to 4 processes for larger documents
+                # finished translations survive reruns of the same document (per provider/model)
+                translation_cache=(_translation_cache_path(tr_provider, tr_model)
+                                   if remember_translations else None),
             )
 
             # Collect produced PDFs
@@ -315,35 +341,16 @@ if st.button("Run translation", disabled=pdf_file is None, type="primary"):
                     # Generate items from the *produced* PDF you want to annotate.
                     # Here we annotate each produced PDF independently.
                     color = _hex_to_rgb01(annot_color_hex)
-                    for p in pdfs:
-                        p = Path(p)
-                        items = build_annotation_items_from_pdf(
-                            pdf_path=str(p),
-                            mode=gen_mode,
-                            regex_pattern=pattern,
-                            min_w=float(min_w),
-                            min_h=float(min_h),
-                            merge_lines=bool(merge_lines),
-                            margin=float(expand_margin),
-                        )
-                        # Save the JSON (optional, for debugging/user download)
-                        gen_json_path = p.with_name(p.stem + ".annotation_items.json")
-                        with open(gen_json_path, "w", encoding="utf-8") as jf:
-                            json.dump(items, jf, ensure_ascii=False, indent=2)
-
-                        out_annot = p.with_name(p.stem + ".annot.pdf")
-                        add_boxes_to_pdf(
-                            input_pdf=str(p),
-                            items=items,
-                            output_pdf=str(out_annot),
-                            page_is_one_based=False,
-                            color=color,
-                            stroke_width=float(annot_stroke_width),
-                            fill_opacity=float(annot_fill_opacity),
-                            use_annot=(annot_use_annot == "annotation-layer"),
-                            fill=bool(annot_fill),
-                        )
-                        annotated_pdfs.append(out_annot)
+                    jobs = [(str(p), gen_mode, pattern, float(min_w), float(min_h), bool(merge_lines),
+                             float(expand_margin), color, float(annot_stroke_width), float(annot_fill_opacity),
+                             annot_use_annot == "annotation-layer", bool(annot_fill)) for p in pdfs]
+                    workers = min(os.cpu_count() or 1, 4)
+                    if workers > 1 and len(jobs) > 1:
+                        # "all" mode produces several PDFs; each is parsed and annotated independently
+                        annotated = _shared_pool(workers).map(annotate_pdf_file, *zip(*jobs))
+                    else:
+                        annotated = [annotate_pdf_file(*job) for job in jobs]
+                    annotated_pdfs.extend(Path(ap) for ap in annotated)
 
                     if annotated_pdfs:
                         zip_display_name = zip_display_name.replace(".zip", ".with_annotations.zip")
@@ -353,27 +360,31 @@ if st.button("Run translation", disabled=pdf_file is None, type="primary"):
             # ----------------------------
             # Package results (original + annotated, if any)
             # ----------------------------
-            zip_buf = io.BytesIO()
-            with zipfile.ZipFile(zip_buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+            # Written to disk and read back once: an in-memory BytesIO plus getvalue() held the
+            # archive twice. PDFs are stored (their streams are deflated already); JSON is deflated.
+            zip_path = workdir / zip_display_name
+            with zipfile.ZipFile(zip_path, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
                 for p in pdfs:
-                    zf.write(p, arcname=Path(p).name)
+                    zf.write(p, arcname=Path(p).name, compress_type=zipfile.ZIP_STORED)
                 for ap in annotated_pdfs:
-                    zf.write(ap, arcname=Path(ap).name)
+                    zf.write(ap, arcname=Path(ap).name, compress_type=zipfile.ZIP_STORED)
                 # also include the JSONs we generated (one per PDF)
                 if do_annotate:
                     for p in pdfs:
                         gen_json = Path(p).with_name(Path(p).stem + ".annotation_items.json")
                         if gen_json.exists():
                             zf.write(gen_json, arcname=gen_json.name)
-            zip_buf.seek(0)
+            # read before the temp dir goes away
+            zip_data = zip_path.read_bytes()
 
-            # Save for preview (persist in session state)
-            st.session_state["preview_src_bytes"] = fitz.open(src_fixed).tobytes()
+            # Save for preview (persist in session state); the files' own bytes, opened
+            # with fitz only when the preview renders
+            st.session_state["preview_src_bytes"] = Path(src_fixed).read_bytes()
             # If "all" mode, picking the first output or the 'main' output is tricky. 
             # All mode makes a zip. Let's just preview the 'hybrid' or 'block' if available, or just skip preview for 'all' mode or pick one.
             # Simpler: If mode != "all", use output_pdf_path.
             if mode != "all" and Path(output_pdf_path).exists():
-                st.session_state["preview_out_bytes"] = fitz.open(output_pdf_path).tobytes()
+                st.session_state["preview_out_bytes"] = Path(output_pdf_path).read_bytes()
             else:
                  # For 'all' mode, maybe we don't preview or we pick the first generated one?
                  # Let's clean session state to avoid confusion
@@ -383,7 +394,7 @@ if st.button("Run translation", disabled=pdf_file is None, type="primary"):
 
     st.download_button(
         "⬇️ Download results (ZIP)",
-        data=zip_buf.getvalue(),
+        data=zip_data,
         file_name=zip_display_name,
         mime="application/zip"
     )
@@ -410,14 +421,14 @@ if st.button("Run translation", disabled=pdf_file is None, type="primary"):
                 
                 with c1:
                     st.caption("Original")
-                    pix1 = doc_src[page_num].get_pixmap(dpi=150)
-                    st.image(pix1.tobytes("png"), use_column_width=True)
+                    st.image(_render_page_png(st.session_state["preview_src_bytes"], page_num, 150),
+                             use_column_width=True)
                     
                 with c2:
                     st.caption("Translated")
                     if page_num < len(doc_out):
-                        pix2 = doc_out[page_num].get_pixmap(dpi=150)
-                        st.image(pix2.tobytes("png"), use_column_width=True)
+                        st.image(_render_page_png(st.session_state["preview_out_bytes"], page_num, 150),
+                                 use_column_width=True)
                     else:
                         st.info("Page not found in output.")
         except Exception as e:
@@ -4,6 +4,9 @@ from unittest.mock import MagicMock
 from PDF_Translate.layout import get_layout_analyzer, SuryaLayoutAnalyzer
 from PDF_Translate.hybrid import extract_blocks_from_layout
 
+# block text on one line for printing (a backslash inside an f-string expression needs Python 3.12+)
+_ONE_LINE = str.maketrans("\n", " ")
+
 def test_layout_loading():
     print("Testing Surya Layout Analyzer loading...")
     try:
@@ -17,6 +20,10 @@ def test_layout_loading():
         
         analyzer = get_layout_analyzer("Surya")
         print("[PASS] SuryaLayoutAnalyzer instantiated (with mocks).")
+        if get_layout_analyzer("Surya") is analyzer:
+            print("[PASS] Analyzer (and its models) shared across calls.")
+        else:
+            print("[FAIL] get_layout_analyzer built a second analyzer.")
         return analyzer
     except Exception as e:
         print(f"[FAIL] Instantiation failed: {e}")
@@ -27,26 +34,35 @@ def test_block_extraction():
     # Create a dummy PDF
     doc = fitz.open()
     page = doc.new_page(width=100, height=100)
-    page.insert_text((10, 10), "Block 1 Line 1")
-    page.insert_text((10, 20), "Block 1 Line 2")
-    page.insert_text((60, 10), "Block 2 Line 1") # Right column
+    # One TextWriter, written once: a single text object for the whole fixture
+    tw = fitz.TextWriter(page.rect)
+    tw.append((10, 10), "Block 1 Line 1")
+    tw.append((10, 20), "Block 1 Line 2")
+    tw.append((60, 10), "Block 2 Line 1") # Right column
+    tw.write_text(page)
     
     # Mock analyzer returning two distinct boxes
     analyzer = MagicMock()
     # mocked return: list of [x0, y0, x1, y1] in pixels
     # Assume 100x100 image for 100x100 pdf (scale 1)
-    analyzer.analyze_page.return_value = [
+    boxes = [
          (5, 5, 50, 50),   # Left block
          (55, 5, 95, 50)   # Right block
     ]
+    analyzer.analyze_page.return_value = boxes
+    # extract_blocks_from_layout batches pages through analyze_pages; real analyzers
+    # answer in pixels of the rendered image, so scale the 100x100 boxes to it
+    analyzer.analyze_pages.side_effect = lambda imgs: [
+        [tuple(v * img.width / 100 for v in b) for b in boxes] for img in imgs
+    ]
     
     try:
         blocks = extract_blocks_from_layout(doc, analyzer)
         print(f"Extracted {len(blocks)} blocks.")
         if len(blocks) == 2:
              print("[PASS] Correctly extracted 2 blocks from AI regions.")
-             print(f"Block 1 text: {blocks[0].text.replace('\n', ' ')}")
-             print(f"Block 2 text: {blocks[1].text.replace('\n', ' ')}")
+             print(f"Block 1 text: {blocks[0].text.translate(_ONE_LINE)}")
+             print(f"Block 2 text: {blocks[1].text.translate(_ONE_LINE)}")
         else:
              print(f"[FAIL] Expected 2 blocks, got {len(blocks)}")
              for i, b in enumerate(blocks):
@@ -5,6 +5,9 @@ predictor = DetectionPredictor()
 # Create dummy image
 img = Image.new('RGB', (100, 100), color = 'white')
 predictions = predictor([img])
+# Several pages in one call: SuryaLayoutAnalyzer.analyze_pages relies on one prediction per image, in order
+batch = predictor([img] * 4)
+print("Batched predictions:", len(batch))
 print("Predictions type:", type(predictions))
 print("First prediction type:", type(predictions[0]))
 print("First prediction dir:", dir(predictions[0]))
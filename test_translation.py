@@ -1,6 +1,7 @@
 import sys
 import os
 from PDF_Translate.translation import get_translator, GoogleTranslator
+from PDF_Translate.utils import already_in_target
 
 def test_google_translation():
     print("Testing Google Translator...")
@@ -16,11 +17,25 @@ def test_google_translation():
     except Exception as e:
         print(f"[FAIL] Google Translator failed: {e}")
 
+def test_google_batch():
+    print("\nTesting Google Translator batch...")
+    try:
+        t = get_translator("Google")
+        texts = ["Hello", "World", "Foo", "Bar"] * 16
+        res = t.translate_batch(texts, "en", "hi")
+        if len(res) == len(texts):
+            print(f"[PASS] Batch returned {len(res)} results in order.")
+        else:
+            print(f"[FAIL] Expected {len(texts)} results, got {len(res)}")
+    except Exception as e:
+        print(f"[FAIL] Google batch failed: {e}")
+
 def test_providers_instantiation():
     print("\nTesting Provider Instantiation (Mock)...")
     try:
         t = get_translator("DeepL", api_key="test")
-        print("[PASS] DeepL instantiated")
+        assert t.supports_batch and t.batch_size > 1
+        print("[PASS] DeepL instantiated (batched)")
     except ImportError:
         print("[SKIP] DeepL lib not found")
     except Exception as e:
@@ -28,7 +43,8 @@ def test_providers_instantiation():
 
     try:
         t = get_translator("OpenAI", api_key="test")
-        print("[PASS] OpenAI instantiated")
+        assert t.supports_batch and t.batch_size > 1
+        print("[PASS] OpenAI instantiated (batched)")
     except ImportError:
         print("[SKIP] OpenAI lib not found")
     except Exception as e:
@@ -40,6 +56,16 @@ def test_providers_instantiation():
     except Exception as e:
         print(f"[FAIL] Ollama instantiation: {e}")
 
+def test_already_in_target():
+    assert already_in_target("12.5 %", "en", "hi")
+    assert already_in_target("राम", "en", "hi")
+    assert not already_in_target("Hello", "en", "hi")
+    # equal Devanagari and Latin letter counts: mixed text still goes to the translator
+    assert not already_in_target("I am राम", "en", "hi")
+    assert not already_in_target("I am राम", "hi", "en")
+
 if __name__ == "__main__":
     test_google_translation()
+    test_google_batch()
     test_providers_instantiation()
+    test_already_in_target()